@@ -0,0 +1,387 @@
+"""
+Benchmarks for musictools.
+
+Run with 'python benchmarks.py' from the repository root.  Every result is a cost (time or memory),
+so lower is always better.
+
+    python benchmarks.py --json results.json        also write the results to a JSON file
+    python benchmarks.py --baseline results.json    compare with saved results, exit with 1 on a regression
+    python benchmarks.py --threshold 0.2            how much slower than the baseline counts as a regression (default 0.1)
+    python benchmarks.py --quick                    smaller workloads, for a fast check
+    python benchmarks.py --only chords modes        run only some groups (see BENCHMARKS)
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import musictools
+from musictools import Note, NoteArray, Interval, Mode, Chord, EXTENSIONS, MODES, QUALITIES
+
+def instance_size(factory, count=10000):
+    """Average number of bytes allocated per object made by 'factory', measured with tracemalloc."""
+    factory()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    list_size = sys.getsizeof(objects)
+    return (after - before - list_size) / count
+
+def per_call(statement, number=100000, setup="pass", namespace=None):
+    """Best time of five runs for one execution of 'statement', in nanoseconds."""
+    timer = timeit.Timer(statement, setup=setup, globals=namespace)
+    return min(timer.repeat(repeat=5, number=number)) / number * 1e9
+
+def best_of(function, repeat=3):
+    """Best time of 'repeat' calls of 'function', in milliseconds."""
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+#Every root spelling with at most one accidental
+ROOTS = tuple(letter + accidental for letter in "CDEFGAB" for accidental in ("", "#", "b"))
+
+#A lead-sheet-like mix of chord symbols
+CHORD_SYMBOLS = (
+    "C", "Am7", "Dm7", "G7", "Cmaj7", "Ebmaj7#11", "F#m7b5", "B7b9", "Bb13", "Ab6/9",
+    "Gsus4", "C7sus4", "Dbmaj9", "E7#9", "Fm6", "Bdim7", "Eb+", "Gm11", "A7(b9,#11)", "D5",
+)
+
+def melody(count):
+    """A repeatable melody of 'count' octave-valued quarter notes, moving by step and leap."""
+    notes = []
+    hard_pitch = 48
+    steps = itertools.cycle((2, 2, 1, -3, 4, -2, -1, 5, -7, 3))
+    for _ in range(count):
+        note = Note.from_hard_pitch(hard_pitch)
+        note.rhythm = 3
+        notes.append(note)
+        hard_pitch += next(steps)
+        if not 36 <= hard_pitch <= 72:
+            hard_pitch = 48
+    return notes
+
+IMPORT_TIME_TARGET_MS = 30
+
+#Uses the scalar API in a fresh interpreter, then exits with 3 if that loaded NumPy
+_IMPORT_SCRIPT = """
+import sys
+import musictools
+note = musictools.Note("A", 4, 3)
+(note + musictools.Interval("maj", "3rd")).frequency
+musictools.Note.from_frequency(440.0)
+musictools.Chord(note, "min", "7").notes
+musictools.Mode("C", "dorian").spelling
+sys.exit(3 if "numpy" in sys.modules else 0)
+"""
+
+def bench_import(quick=False):
+    """
+    | Cumulative time to import musictools in a fresh interpreter, from 'python -X importtime', best of five, in ms.
+    | Raises an AssertionError if using the scalar API imports NumPy.
+    """
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    times = []
+    for _ in range(2 if quick else 5):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", _IMPORT_SCRIPT],
+            capture_output=True, text=True, env=env, cwd=cwd,
+        )
+        if result.returncode == 3:
+            raise AssertionError("The scalar API imported NumPy.")
+        if result.returncode:
+            raise RuntimeError(result.stderr)
+        for line in result.stderr.splitlines():
+            fields = line.split("|")
+            if len(fields) == 3 and fields[2].strip() == "musictools":
+                times.append(int(fields[1]) / 1000)
+    return {"import musictools": (min(times), "ms")}
+
+def bench_memory(quick=False):
+    """Bytes allocated per instance of the value classes."""
+    count = 2000 if quick else 10000
+    return {
+        "Note": (instance_size(lambda: Note("C#", 4, 3), count), "bytes"),
+        "Interval": (instance_size(lambda: Interval("maj", "3rd"), count), "bytes"),
+        "Mode": (instance_size(lambda: Mode(Note("C"), "major"), count), "bytes"),
+    }
+
+def bench_note(quick=False):
+    """Creating Notes, the Note setters, and the Note methods used most."""
+    number = 10000 if quick else 100000
+    namespace = {"Note": Note, "note": Note("C#", 4, 3), "third": Interval("maj", "3rd")}
+    results = {}
+    for (name, statement) in (
+        ("Note()", "Note('C#', 4, 3)"),
+        ("octave setter", "note.octave = 4"),
+        ("rhythm setter", "note.rhythm = 3"),
+        ("dots setter", "note.dots = 1"),
+        ("triplet setter", "note.triplet = False"),
+        ("frequency", "note.frequency"),
+        ("enharmonic()", "note.enharmonic()"),
+        ("from_frequency()", "Note.from_frequency(451.3)"),
+        ("from_hard_pitch()", "Note.from_hard_pitch(49)"),
+        ("+ Interval", "note + third"),
+    ):
+        results[name] = (per_call(statement, number, namespace=namespace), "ns")
+    return results
+
+def bench_interval(quick=False):
+    """Creating an Interval, reading its computed properties, and measuring one between two Notes."""
+    number = 10000 if quick else 100000
+    interval = Interval("aug2", "4th", 1)
+    interval.name
+    namespace = {"Interval": Interval, "interval": interval, "low": Note("Eb", 3), "high": Note("C#", 5)}
+    results = {}
+    for (name, statement) in (
+        ("Interval('maj', '3rd')", "Interval('maj', '3rd')"),
+        ("Interval('aug2', '4th', 1)", "Interval('aug2', '4th', 1)"),
+        ("pitch_difference", "interval.pitch_difference"),
+        ("letter_difference", "interval.letter_difference"),
+        ("name", "interval.name"),
+        ("from_notes()", "Interval.from_notes(low, high)"),
+    ):
+        results[name] = (per_call(statement, number, namespace=namespace), "ns")
+    return results
+
+def bench_transpose(quick=False):
+    """Transposing a melody of 100k notes (10k with --quick) up a major third, as Notes and as a NoteArray."""
+    notes = melody(10000 if quick else 100000)
+    array = NoteArray.from_notes(notes)
+    third = Interval("maj", "3rd")
+    musictools.fill_transposition_table()
+    return {
+        "Note + Interval, every note": (best_of(lambda: [note + third for note in notes]), "ms"),
+        "transpose(), list of Notes": (best_of(lambda: musictools.transpose(notes, third)), "ms"),
+        "transpose(), NoteArray": (best_of(lambda: musictools.transpose(array, third)), "ms"),
+    }
+
+def bench_modes(quick=False):
+    """Spelling every entry of MODES on every root, with an empty spelling cache and with a full one."""
+    def spell_all():
+        for root in ROOTS:
+            for mode in MODES:
+                Mode(root, mode).spelling
+    def spell_all_cold():
+        musictools.set_mode_cache_size(4096)
+        spell_all()
+    spell_all()
+    return {
+        "every mode, every root, cold": (best_of(spell_all_cold), "ms"),
+        "every mode, every root, cached": (best_of(spell_all), "ms"),
+    }
+
+def bench_chords(quick=False):
+    """Building a Chord of every quality with every extension on every root, then parsing chord symbols."""
+    roots = [Note(root, 4) for root in ROOTS]
+    def build_all():
+        for root in roots:
+            for quality in QUALITIES:
+                for extension in EXTENSIONS:
+                    Chord(root, quality, extension)
+    def build_all_cold():
+        musictools.set_chord_cache_size(4096)
+        build_all()
+    build_all()
+    count = 10000 if quick else 100000
+    symbols = list(itertools.islice(itertools.cycle(CHORD_SYMBOLS), count))
+    parse = musictools._parse_chord_symbol
+    parse_ms = best_of(lambda: [parse(symbol) for symbol in symbols])
+    chords_ms = best_of(lambda: list(musictools.parse_chord_symbols(symbols, 4)))
+    return {
+        "every EXTENSIONS chord, every root, cold": (best_of(build_all_cold), "ms"),
+        "every EXTENSIONS chord, every root, cached": (best_of(build_all), "ms"),
+        "chord symbol, parse only": (parse_ms / count * 1e6, "ns"),
+        "chord symbol, parse_chord_symbols()": (chords_ms / count * 1e6, "ns"),
+    }
+
+def bench_lookup(quick=False):
+    """Naming a chord from its notes and finding the modes that contain a set of notes."""
+    number = 2000 if quick else 20000
+    namespace = {
+        "musictools": musictools,
+        "chord": [Note(name) for name in ("F#", "A", "C", "E")],
+        "scale": [Note(name) for name in ("C", "E", "G", "Bb")],
+    }
+    musictools.identify_chord(namespace["chord"])
+    return {
+        "identify_chord()": (per_call("musictools.identify_chord(chord)", number, namespace=namespace), "ns"),
+        "find_modes()": (per_call("musictools.find_modes(scale)", number, namespace=namespace), "ns"),
+    }
+
+def pitch_readings(count, hop=0.01):
+    """
+    | A repeatable synthetic pitch-tracker stream: 'count' (timestamp, Hz, confidence) rows, 'hop' seconds apart,
+    | following the melody with 20 cents of jitter, 5% unvoiced readings and 1% octave errors.
+    """
+    import numpy
+    random = numpy.random.default_rng(0)
+    hard_pitches = [note.hard_pitch for note in melody(count // 25 + 1)]
+    positions = numpy.repeat(hard_pitches, 25)[:count] + random.normal(0, 0.2, count)
+    Hz = 440 * 2 ** ((positions - 57) / 12)
+    Hz[random.random(count) < 0.01] *= 2
+    confidence = numpy.where(random.random(count) < 0.05, 0.1, 0.9)
+    return numpy.stack((numpy.arange(count) * hop, Hz, confidence), axis=1)
+
+def bench_tracker(quick=False):
+    """Tracking notes in a synthetic stream of 200k pitch readings (20k with --quick), one reading at a time and in chunks."""
+    readings = pitch_readings(20000 if quick else 200000)
+    rows = [tuple(row) for row in readings.tolist()]
+    chunks = [readings[start:start + 1024] for start in range(0, len(readings), 1024)]
+    count = len(readings)
+    return {
+        "track_pitches(), per reading": (best_of(lambda: list(musictools.track_pitches(rows))) / count * 1e6, "ns"),
+        "track_pitches(), per reading in chunks": (best_of(lambda: list(musictools.track_pitches(chunks))) / count * 1e6, "ns"),
+    }
+
+def bench_audio(quick=False):
+    """
+    | Rendering a minute of 8-voice audio at 48 kHz (10 seconds with --quick) in memory and streamed to a WAV file.
+    | The streamed render is repeated on a piece ten times as long: its peak memory should not grow with the length.
+    """
+    import musictools_audio
+    seconds = 10 if quick else 60
+    voices = [melody(2 * seconds) for _ in range(8)]
+    synth = musictools_audio.Synth("saw", musictools_audio.Envelope(0.01, 0.1, 0.7, 0.1))
+    time = best_of(lambda: synth.render(*voices))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "render.wav")
+        def peak_of(voices):
+            tracemalloc.start()
+            streamed = best_of(lambda: synth.render_to_file(path, *voices), repeat=1)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return streamed, peak
+        streamed, peak = peak_of(voices)
+        long_peak = peak_of([melody(20 * seconds) for _ in range(8)])[1]
+    return {
+        "Synth.render(), 8 voices": (time, "ms"),
+        "Synth.render(), share of real time": (time / (seconds * 1000) * 100, "%"),
+        "Synth.render_to_file(), 8 voices": (streamed, "ms"),
+        "Synth.render_to_file(), peak memory": (peak / 1024, "KiB"),
+        "Synth.render_to_file(), peak memory, 10x longer piece": (long_peak / 1024, "KiB"),
+    }
+
+def bench_midi(quick=False):
+    """
+    | Encoding a MIDI file of 1M note events (100k with --quick) from a NoteArray, and of a melody of Note objects,
+    | then reading the file back.  Parse speed is a cost like the others: milliseconds per MB, or 1000 / (MB/s).
+    """
+    import numpy
+    import musictools_midi
+    count = 50000 if quick else 500000
+    pitches = NoteArray.from_hard_pitches(numpy.arange(count) % 48 + 36)
+    array = NoteArray(pitches.letter, pitches.offset, pitches.octave, rhythm=numpy.full(count, 4), dots=numpy.arange(count) % 2)
+    notes = melody(count // 50)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "events.mid")
+        size = musictools_midi.write_midi(path, array)
+        read = best_of(lambda: list(musictools_midi.read_midi(path)))
+    return {
+        "encode_midi(), NoteArray, per event": (best_of(lambda: musictools_midi.encode_midi(array)) / (2 * count) * 1e6, "ns"),
+        "encode_midi(), Notes, per event": (best_of(lambda: musictools_midi.encode_midi(notes)) / (2 * len(notes)) * 1e6, "ns"),
+        "read_midi(), per MB": (read / (size / 1e6), "ms"),
+    }
+
+#Benchmark groups, in the order they run
+BENCHMARKS = {
+    "import": bench_import,
+    "memory": bench_memory,
+    "note": bench_note,
+    "interval": bench_interval,
+    "transpose": bench_transpose,
+    "modes": bench_modes,
+    "chords": bench_chords,
+    "lookup": bench_lookup,
+    "tracker": bench_tracker,
+    "audio": bench_audio,
+    "midi": bench_midi,
+}
+
+def run(groups=None, quick=False, report=print):
+    """
+    | Runs the benchmark groups named in 'groups' (all of BENCHMARKS by default) and returns the results
+    | as {"group.name": {"value": cost, "unit": unit}}.  Each result is passed to 'report' as a line of text.
+    """
+    results = {}
+    for group in groups or BENCHMARKS:
+        if group not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark group '{group}'. Choose from: {', '.join(BENCHMARKS)}")
+        for (name, (value, unit)) in BENCHMARKS[group](quick).items():
+            key = f"{group}.{name}"
+            results[key] = {"value": value, "unit": unit}
+            if report:
+                report(f"{key}: {value:,.1f} {unit}")
+    return results
+
+def compare(results, baseline, threshold=0.1):
+    """
+    | Compares results with baseline results (both as returned by run) and returns a list of
+    | (name, baseline value, value, relative change, status) for every result found in both.
+    | The status is 'regressed' when the value is more than 'threshold' (a fraction) above the baseline,
+    | 'improved' when it is more than 'threshold' below it, and 'ok' otherwise.
+    """
+    rows = []
+    for (name, result) in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["value"]
+        after = result["value"]
+        change = (after - before) / before if before else 0.0
+        if change > threshold:
+            status = "regressed"
+        elif change < -threshold:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append((name, before, after, change, status))
+    return rows
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmarks for musictools.  All results are costs: lower is better.")
+    parser.add_argument("--json", metavar="PATH", help="write the results to this JSON file")
+    parser.add_argument("--baseline", metavar="PATH", help="JSON file written by an earlier --json run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown that counts as a regression (default 0.1)")
+    parser.add_argument("--quick", action="store_true", help="use smaller workloads")
+    parser.add_argument("--only", nargs="+", metavar="GROUP", choices=list(BENCHMARKS), help="benchmark groups to run")
+    options = parser.parse_args(arguments)
+
+    results = run(options.only, options.quick)
+    import_ms = results.get("import.import musictools", {}).get("value")
+    if import_ms is not None and import_ms > IMPORT_TIME_TARGET_MS:
+        print(f"Import time is over the {IMPORT_TIME_TARGET_MS} ms target.")
+
+    if options.json:
+        document = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": options.quick,
+            "results": results,
+        }
+        with open(options.json, "w") as file:
+            json.dump(document, file, indent=2)
+
+    if options.baseline:
+        with open(options.baseline) as file:
+            document = json.load(file)
+        if document.get("quick") != options.quick:
+            print("The baseline was run with different workload sizes (--quick), so results may not be comparable.")
+        rows = compare(results, document["results"], options.threshold)
+        print(f"\nCompared with {options.baseline} (threshold {options.threshold:.0%}):")
+        for (name, before, after, change, status) in rows:
+            print(f"  {status:>9}  {name}: {before:,.1f} -> {after:,.1f} ({change:+.0%})")
+        if any(row[4] == "regressed" for row in rows):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
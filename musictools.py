@@ -1,14 +1,45 @@
-from numpy import log2, power
+from bisect import bisect_left
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from fractions import Fraction
+from importlib import import_module
+from math import isfinite, log2
+from numbers import Real
+from os import replace
 from re import match
-from time import sleep
+from time import perf_counter_ns
+
+class _LazyModule:
+
+    """Stands in for a module that is only imported the first time one of its attributes is used."""
+
+    def __init__(self,name):
+        self.__name = name
+        self.__module = None
+
+    def __getattr__(self,attribute):
+        if self.__module is None:
+            self.__module = import_module(self.__name)
+        return getattr(self.__module,attribute)
+
+#NumPy is only needed by the vectorized paths (NoteArray and friends), so it is not loaded until one of them runs
+np = _LazyModule("numpy")
 
 __A4 = 440
 
+#The A4 and Tuning set by the innermost 'with tuning(...)' block of the running thread or task, None outside any
+#block or for a value the block leaves alone.  See tuning().
+_pitch_context = ContextVar("musictools_pitch_context",default=None)
+
 def get_A4():
-    global __A4
-    return __A4
+    """Returns the frequency of A4 in Hz: the one set by the current 'with tuning(A4=...)' block, or else set_A4's."""
+    context = _pitch_context.get()
+    if context is None or context[0] is None:
+        return __A4
+    return context[0]
 
-def set_A4(Hz):
+def _check_A4(Hz):
     err = 'Hz value for A4 must be a positive number.'
 
     if type(Hz) is not int and type(Hz) is not float:
@@ -17,24 +48,223 @@ def set_A4(Hz):
     if Hz <= 0:
         raise ValueError(err)
 
+def set_A4(Hz):
+    """
+    | Sets the process-wide default frequency of A4 in Hz (440 to begin with).
+    | Code inside a 'with tuning(A4=...)' block keeps using that block's value.
+    """
+    _check_A4(Hz)
+
     global __A4
     __A4 = Hz
 
+class _LRUCache:
+
+    """A small least-recently-used cache with a size limit and hit/miss counters."""
+
+    def __init__(self,maxsize):
+        if type(maxsize) is not int or maxsize < 1:
+            raise ValueError("Cache size must be a positive integer.")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.__data = OrderedDict()
+
+    def get(self,key,default=None):
+        try:
+            value = self.__data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self.__data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self,key,value):
+        self.__data[key] = value
+        self.__data.move_to_end(key)
+        if len(self.__data) > self.maxsize:
+            self.__data.popitem(last=False)
+
+    def clear(self):
+        """Drop every entry.  The hit/miss counters are kept."""
+        self.__data.clear()
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "maxsize": self.maxsize,
+            "currsize": len(self.__data),
+        }
+
+    def __len__(self):
+        return len(self.__data)
+
+__note_pool = None
+__interval_pool = None
+
+def enable_interning(maxsize=1024):
+    """
+    | Turn on sharing of Note and Interval objects that musictools creates for you.
+    |
+    | While on, Note.from_values, Note.from_hard_pitch, Note.enharmonic, Note + Interval, Chord, Mode, etc.
+    | hand out one shared instance per distinct value, from pools that keep at most 'maxsize' of each.
+    | Notes you create yourself with Note(...) are never shared.
+    |
+    | Shared Notes are read-only: setting octave, rhythm, dots or triplet on one raises an AttributeError.
+    | Call .copy() on a shared Note to get a Note of your own that can be changed (copy on write).
+    """
+    global __note_pool, __interval_pool
+    __note_pool = _LRUCache(maxsize)
+    __interval_pool = _LRUCache(maxsize)
+
+def disable_interning():
+    """Turn off sharing of Note and Interval objects and empty the pools.  Already shared objects stay read-only."""
+    global __note_pool, __interval_pool
+    __note_pool = None
+    __interval_pool = None
+
+def interning_info():
+    """Returns hit/miss counters and sizes of the Note and Interval pools, or None while interning is off."""
+    if __note_pool is None:
+        return None
+    return {"Note": __note_pool.info(), "Interval": __interval_pool.info()}
+
+def _note_pool():
+    return __note_pool
+
+def _interval_pool():
+    return __interval_pool
+
 class _Meta:
-    __locked = False
-    __RESTRICTED = (
-        "enharmonic",
+
+    """
+    | Base class of the musictools value classes.
+    | Each class lists its attributes in __slots__, so instances have a fixed layout and no __dict__,
+    | and setting any attribute the class does not have (or a method, like 'enharmonic') raises an AttributeError.
+    """
+
+    __slots__ = ()
+
+class Rhythm(_Meta):
+
+    """
+    | An immutable rhythm value, as returned by Note.rhythm.
+    |
+    | Use Rhythm.get(value, dots, triplet) rather than creating one yourself,
+    | it returns the same cached object for every equal rhythm with up to Rhythm.CACHED_DOTS dots.
+    |
+    | 'value' is the integer used to set the rhythm (see Note.RHYTHM_SETTER_VALUES).
+    | 'length' measures the rhythm in 512th notes, taking dots and triplets into account.
+    | It is an exact Fraction, so lengths can be added up over any number of notes without rounding.
+    """
+
+    class_name = "Rhythm"
+
+    __VALUES = (
+        ("double whole", 1024),
+        ("whole", 512),
+        ("half", 256),
+        ("quarter", 128),
+        ("8th", 64),
+        ("16th", 32),
+        ("32nd", 16),
+        ("64th", 8),
+        ("128th", 4),
+        ("256th", 2),
+        ("512th", 1),
     )
-    def __setattr__(self, name, value):
-        if (self.__locked 
-                and name not in dir(self) 
-                or name in _Meta.__RESTRICTED 
-                or name.startswith("__")):
-            raise AttributeError(f"Cannot set attribute '{name}'.")
-        object.__setattr__(self, name, value)
 
-    def _lock(self):
-        self.__locked = True
+    #Only Rhythms with up to this many dots are cached, so the cache stays bounded
+    CACHED_DOTS = 3
+
+    __CACHE = {}
+
+    __slots__ = ("__value", "__dots", "__triplet", "__name", "__length")
+
+    def __init__(self,value,dots=0,triplet=False):
+
+        if value not in range(11) or type(value) is not int:
+            raise ValueError('Rhythm value must be an integer between 0 and 10. See Note.RHYTHM_SETTER_VALUES')
+        if type(dots) is not int or dots < 0:
+            raise ValueError('Dot value must be a positive integer or 0.')
+        if type(triplet) is not bool:
+            raise ValueError('Triplet value must be Boolean.')
+
+        (name,length) = Rhythm.__VALUES[value]
+        if dots:
+            if dots > 1:
+                name = f"dotted(x{dots}) " + name
+            else:
+                name = "dotted " + name
+            #Each dot adds half of the previous addition: length * (2 - 1/2^dots)
+            length = Fraction(length * (2 ** (dots + 1) - 1), 2 ** dots)
+        else:
+            length = Fraction(length)
+        if triplet:
+            name += " triplet"
+            length *= Fraction(2,3)
+
+        self.__value = value
+        self.__dots = dots
+        self.__triplet = triplet
+        self.__name = name
+        self.__length = length
+
+    @classmethod
+    def get(self,value,dots=0,triplet=False):
+        """Returns the cached Rhythm for these values (a new one for more than Rhythm.CACHED_DOTS dots)."""
+        key = (value,dots,triplet)
+        rhythm = Rhythm.__CACHE.get(key)
+        if rhythm is None:
+            rhythm = Rhythm(value,dots,triplet)
+            if dots <= Rhythm.CACHED_DOTS:
+                Rhythm.__CACHE[key] = rhythm
+        return rhythm
+
+    @property
+    def value(self):
+        """The original integer used to set the rhythm."""
+        return self.__value
+
+    @property
+    def dots(self):
+        """The number of dots."""
+        return self.__dots
+
+    @property
+    def triplet(self):
+        """True for a 3:2 triplet."""
+        return self.__triplet
+
+    @property
+    def name(self):
+        """A string describing the rhythm, like 'dotted quarter' or '8th triplet'."""
+        return self.__name
+
+    @property
+    def length(self):
+        """The length of the rhythm measured in 512th notes, as an exact Fraction."""
+        return self.__length
+
+    def __eq__(self,other):
+        if type(other) is not Rhythm:
+            return NotImplemented
+        return (self.__value,self.__dots,self.__triplet) == (other.__value,other.__dots,other.__triplet)
+
+    def __hash__(self):
+        return hash((self.__value,self.__dots,self.__triplet))
+
+    def __repr__(self):
+        return f"Rhythm({self.__value}, dots={self.__dots}, triplet={self.__triplet})"
+
+#Every rhythm with up to three dots is made up front, others are cached on first use
+for _value in range(11):
+    for _dots in range(4):
+        for _triplet in (False, True):
+            Rhythm.get(_value,_dots,_triplet)
+del _value, _dots, _triplet
 
 class Note(_Meta):
 
@@ -69,20 +299,6 @@ class Note(_Meta):
         512th: 10
     """
 
-    __RHYTHM_VALUES = (
-        ("double whole", 1024),
-        ("whole", 512),
-        ("half", 256),
-        ("quarter", 128),
-        ("8th", 64),
-        ("16th", 32),
-        ("32nd", 16),
-        ("64th", 8),
-        ("128th", 4),
-        ("256th", 2),
-        ("512th", 1),
-    )
-
     __PITCH_VALUES = (
         ("C",0),("D",2),
         ("E",4),("F",5),
@@ -92,6 +308,8 @@ class Note(_Meta):
 
     __NOTE_REGEX = r'[A-G](#|b)*$'
 
+    __slots__ = ("__name", "__octave", "__rhythm", "__dots", "__triplet", "__shared")
+
     def __init__(self,name,octave=None,rhythm=0,dots=0,triplet=False):
 
         if type(name) is not str:
@@ -123,8 +341,20 @@ class Note(_Meta):
         self.__rhythm = rhythm
         self.__dots = dots
         self.__triplet = triplet
+        self.__shared = False
 
-        self._lock()
+    @property
+    def shared(self):
+        """Boolean.  Returns True if the Note is a shared, read-only instance (see enable_interning)."""
+        return self.__shared
+
+    def __check_not_shared(self):
+        if self.__shared:
+            raise AttributeError("Cannot change a shared Note.  Use .copy() to get a Note that can be changed.")
+
+    def copy(self):
+        """Returns a new Note with the same values.  A copy is never shared, so it can always be changed."""
+        return Note._from_fields(self.__name,self.__octave,self.__rhythm,self.__dots,self.__triplet)
 
     @property
     def is_rest(self):
@@ -142,6 +372,7 @@ class Note(_Meta):
 
     @octave.setter
     def octave(self,value):
+        self.__check_not_shared()
         if self.is_rest:
             raise ValueError("Cannot set an octave value for a rest.")
         if type(value) is not int and value != None:
@@ -155,6 +386,7 @@ class Note(_Meta):
     
     @dots.setter
     def dots(self,value):
+        self.__check_not_shared()
         err = "Dot value must be a positive integer or 0."
         if type(value) is not int:
             raise ValueError(err)
@@ -169,6 +401,7 @@ class Note(_Meta):
     
     @triplet.setter
     def triplet(self,value):
+        self.__check_not_shared()
         if type(value) is not bool:
             raise ValueError("Triplet value must be Boolean.")
         self.__triplet = value
@@ -179,32 +412,21 @@ class Note(_Meta):
         | Set the basic rhythm with an integer.  
         View Note.RHYTHM_SETTER_VALUES to see what number corresponds to which rhythm.
         |
-        | Returns an object with three properties: name, size, and value
+        | Returns a Rhythm object (cached and immutable) with these properties, among others:
         |
         | .rhythm.name is a string describing the rhythm
-        | .rhythm.length is a number that measures the rhythm in 512th notes
+        | .rhythm.length is an exact Fraction that measures the rhythm in 512th notes
         | .rhythm.value is the original integer used to set the rhythm
         | 
-        | .rhtyhm.size does take into account dot and triplet settings.
+        | .rhythm.length does take into account dot and triplet settings.
         """
         if not self.__rhythm: 
             return None
-        (__rhy_name,__rhy_size) = Note.__RHYTHM_VALUES[self.__rhythm]
-        if self.dots:
-            if self.dots > 1:
-                __rhy_name = f"dotted(x{self.dots}) " + __rhy_name
-            else:
-                __rhy_name = "dotted " + __rhy_name
-            __orig_value = __rhy_size
-            for __n in range(self.dots):
-                __rhy_size += (__orig_value/(power(2,__n + 1)))
-        if self.triplet:
-            __rhy_name += " triplet"
-            __rhy_size *= (2/3)
-        return type('obj', (object,), {'name': __rhy_name, 'length': __rhy_size, 'value': self.__rhythm})
+        return Rhythm.get(self.__rhythm,self.__dots,self.__triplet)
 
     @rhythm.setter
     def rhythm(self,value):
+        self.__check_not_shared()
         if value not in range(11) and value != None:
             raise ValueError('Rhythm value must be set with an integer between 0 and 10.')
         self.__rhythm = value
@@ -303,12 +525,12 @@ class Note(_Meta):
         """
         | Returns The standard frequency measured in Hz. 
         |
-        | Change the default for A4 (440Hz) with the global set_A4() function.
+        | Change the default for A4 (440Hz) with the global set_A4() function,
+        | and the tuning (12-tone equal temperament) with set_tuning().
         """
         if self.octave == None:
             return None
-        offset = self.hard_pitch - 57
-        return get_A4() * power(2,(offset/12))
+        return get_tuning().frequency(self)
     
     __GROSS_ROOTS = {"B":"Cb","C":"B#","E":"Fb","F":"E#"}
     __NON_NATURAL = (1,3,6,8,10)
@@ -336,7 +558,7 @@ class Note(_Meta):
             elif 'b' in new_name and prefer == '#':
                 return self
             else:
-                new_note = Note(new_name)
+                new_note = Note._make(new_name)
         elif len(self.note_name) == 1:
             return self
         elif len(self.note_name) == 2:
@@ -371,13 +593,8 @@ class Note(_Meta):
                 new_note = Note.from_values(new_letter + 1, self.pitch)
             elif "b" in new_note.name and prefer == "#":
                 new_note = Note.from_values(new_letter - 1, self.pitch)
-        new_note.octave = self.octave
-        if self.rhythm:
-            new_note.rhythm = self.rhythm.value
-        new_note.dots = self.dots
-        new_note.triplet = self.triplet
-        
-        return new_note
+        rhythm = self.__rhythm if self.rhythm else new_note.__rhythm
+        return new_note._with(self.octave,rhythm,self.dots,self.triplet)
     
     def sort_from_root(self,note_object):
         """
@@ -396,7 +613,18 @@ class Note(_Meta):
             assert interval.class_name == "Interval"
         except:
             raise ValueError("__add__ method for Note requires an Interval object.")
+        return _transpose_note(self,interval,False)
+
+    def __sub__(self,interval):
+        """Subtract an Interval object to a Note to return the note descended from that interval."""
+        try:
+            assert interval.class_name == "Interval"
+        except:
+            raise ValueError("__add__ method for Note requires an Interval object.")
+        return _transpose_note(self,interval,True)
 
+    #The original note arithmetic, used to fill the transposition table (see transpose)
+    def _ascend(self,interval):
         letter = self.letter + interval.letter_difference
         if letter > 6:
             letter -= 7
@@ -414,20 +642,10 @@ class Note(_Meta):
                 pitch -= 12
             new_note = Note.from_values(letter,pitch)
 
-        if self.rhythm:
-            new_note.rhythm = self.rhythm.value
-        new_note.dots = self.dots
-        new_note.triplet = self.triplet
-
-        return new_note
-    
-    def __sub__(self,interval):
-        """Subtract an Interval object to a Note to return the note descended from that interval."""
-        try:
-            assert interval.class_name == "Interval"
-        except:
-            raise ValueError("__add__ method for Note requires an Interval object.")
+        rhythm = self.__rhythm if self.rhythm else new_note.__rhythm
+        return new_note._with(new_note.__octave,rhythm,self.dots,self.triplet)
 
+    def _descend(self,interval):
         letter = self.letter - interval.letter_difference
         if letter < 0:
             letter += 7
@@ -445,12 +663,8 @@ class Note(_Meta):
                 pitch += 12
             new_note = Note.from_values(letter,pitch)
 
-        if self.rhythm:
-            new_note.rhythm = self.rhythm.value
-        new_note.dots = self.dots
-        new_note.triplet = self.triplet
-
-        return new_note
+        rhythm = self.__rhythm if self.rhythm else new_note.__rhythm
+        return new_note._with(new_note.__octave,rhythm,self.dots,self.triplet)
         
 
     @classmethod
@@ -469,10 +683,10 @@ class Note(_Meta):
         elif pitch_offset < -6:
             pitch_offset += 12
         if pitch_offset == 0:
-            return Note(letter_str)
+            return Note._make(letter_str)
         if pitch_offset < 0:
-            return Note(letter_str + "b" * (-1 * pitch_offset))
-        return Note(letter_str + "#" * pitch_offset)
+            return Note._make(letter_str + "b" * (-1 * pitch_offset))
+        return Note._make(letter_str + "#" * pitch_offset)
 
     @classmethod
     def from_hard_pitch(self,hard_pitch,prefer_flat=False):
@@ -490,174 +704,951 @@ class Note(_Meta):
         index = 0
         for note in Note.__PITCH_VALUES:
             if pitch == note[1]:
-                return Note(note[0],octave=octave)
+                return Note._make(note[0],octave)
             if pitch == note[1] + 1:
                 if prefer_flat:
-                    if i == 6:
-                        i = -1
-                    return Note(Note.__PITCH_VALUES[index + 1][0] + "b",octave=octave)
-                return Note(note[0] + "#",octave=octave)
+                    if pitch == Note.__PITCH_VALUES[index + 1][1]:
+                        return Note._make(Note.__PITCH_VALUES[index + 1][0],octave)
+                    return Note._make(Note.__PITCH_VALUES[index + 1][0] + "b",octave)
+                return Note._make(note[0] + "#",octave)
             index += 1
     
     @classmethod
     def from_frequency(self,Hz,prefer_flat=False):
+        """
+        | Returns a Note object (octave valued) nearest to a frequency in Hz.
+        | Will return a sharp note unless prefer_flat is set to True
+        | For many frequencies at once, use NoteArray.from_frequencies.
+        """
         if type(Hz) is not int and type(Hz) is not float:
             raise ValueError("Please provide a positive number for the Hz value.")
         if Hz <= 0:
             raise ValueError("Please provide a positive number for the Hz value.")
+        tuning = get_tuning()
+        if tuning is not EQUAL_TEMPERAMENT:
+            return tuning.from_frequency(Hz,prefer_flat)
         return Note.from_hard_pitch(int(round(12 * (log2(Hz) - log2(get_A4()))) + 57),prefer_flat=prefer_flat)
-    
-class Interval(_Meta):
 
-    class_name = "Interval"
+    @classmethod
+    def _from_fields(self,name,octave=None,rhythm=0,dots=0,triplet=False,shared=False):
+        """Builds a Note from values that are already known to be valid, skipping the checks done in __init__."""
+        note = object.__new__(Note)
+        note.__name = name
+        note.__octave = octave
+        note.__rhythm = rhythm
+        note.__dots = dots
+        note.__triplet = triplet
+        note.__shared = shared
+        return note
+
+    def _fields(self):
+        """The values of the Note as a tuple (name, octave, rhythm, dots, triplet), read without going through the properties."""
+        return (self.__name,self.__octave,self.__rhythm,self.__dots,self.__triplet)
+
+    @classmethod
+    def _make(self,name,octave=None,rhythm=0,dots=0,triplet=False):
+        """Returns a Note for already valid values, taken from the shared pool while interning is on."""
+        pool = _note_pool()
+        if pool is None:
+            return Note._from_fields(name,octave,rhythm,dots,triplet)
+        key = (name,octave,rhythm,dots,triplet)
+        note = pool.get(key)
+        if note is None:
+            note = Note._from_fields(name,octave,rhythm,dots,triplet,shared=True)
+            pool.put(key,note)
+        return note
+
+    def _with(self,octave,rhythm,dots,triplet):
+        """Returns this Note if it already has these values, or else a Note of the same name that does."""
+        if (self.__octave == octave and self.__rhythm == rhythm
+                and self.__dots == dots and self.__triplet == triplet):
+            return self
+        return Note._make(self.__name,octave,rhythm,dots,triplet)
+
+class NoteArray(_Meta):
 
     """
-    | Use this class to create Interval objects, or take advantage of its class methods.
-    | 
-    | For the 'quality', use "maj"(major), "min"(minor), "per"(perfect), "aug"(augmented), or "dim"(diminished).
-    | 
-    | For the 'base', use "uni"(unison),"2nd","3rd","4th", and so on up to "7th."
-    | 
-    | Set 'displace' to a number to displace an interval by a number of octaves.
-    | For example, a unison that is displaced by 1 is the same as a perfect octave.
+    | A columnar collection of many notes.  Also see class methods.
+    |
+    | Instead of one Note object per event, a NoteArray keeps parallel NumPy integer arrays
+    | for the letter, accidental offset, octave, rhythm, dots and triplet values of every note.
+    |
+    | 'letter' uses 0 for C up to 6 for B (like Note.letter), or NoteArray.REST for a rest.
+    | 'offset' is the number of sharps (positive) or flats (negative), like Note.pitch_offset.
+    | 'octave' uses NoteArray.NO_OCTAVE for notes that have no octave value.
+    | 'rhythm', 'dots' and 'triplet' take the same values used to create a Note.
+    |
+    | The pitch, hard_pitch, frequency, sharps, flats and name columns match the properties of the same name on Note.
+    | Where a Note property would return None, the column is masked (see numpy.ma), so .tolist() gives None there.
     """
 
-    class_name = "Interval"
-
-    BASES = (
-        "uni", "2nd", "3rd", 
-        "4th", "5th", "6th", 
-        "7th",
-    )
+    class_name = "NoteArray"
+
+    REST = -1
+    NO_OCTAVE = -2 ** 31
+
+    __slots__ = ("__letter", "__offset", "__octave", "__rhythm", "__dots", "__triplet")
+
+    __LETTERS = "CDEFGAB"
+    __LETTER_PITCHES = (0, 2, 4, 5, 7, 9, 11)
+
+    def __init__(self,letter,offset=None,octave=None,rhythm=None,dots=None,triplet=None):
+
+        letter = np.array(letter, dtype=np.int8, ndmin=1)
+        if letter.ndim != 1:
+            raise ValueError("NoteArray columns must be one-dimensional.")
+        size = len(letter)
+
+        def column(values, dtype, default):
+            if values is None:
+                return np.full(size, default, dtype=dtype)
+            values = np.array(values, dtype=dtype, ndmin=1)
+            if values.shape != (size,):
+                raise ValueError("All NoteArray columns must have the same length.")
+            return values
+
+        offset = column(offset, np.int8, 0)
+        octave = column(octave, np.int32, NoteArray.NO_OCTAVE)
+        rhythm = column(rhythm, np.int8, 0)
+        dots = column(dots, np.int8, 0)
+        triplet = column(triplet, np.int8, 0)
+
+        if size:
+            if letter.min() < NoteArray.REST or letter.max() > 6:
+                raise ValueError("Letter values must be between 0 and 6, or NoteArray.REST for a rest.")
+            if rhythm.min() < 0 or rhythm.max() > 10:
+                raise ValueError('Rhythm value must be an integer between 0 and 10. See Note.RHYTHM_SETTER_VALUES')
+            if dots.min() < 0:
+                raise ValueError('Dot value must be a positive integer or 0.')
+            if triplet.min() < 0 or triplet.max() > 1:
+                raise ValueError('Triplet values must be 0 or 1.')
+
+        self.__letter = letter
+        self.__offset = offset
+        self.__octave = octave
+        self.__rhythm = rhythm
+        self.__dots = dots
+        self.__triplet = triplet
 
-    __BASE_INTERVALS = {
-        "uni": (0,), "2nd": (1,2),
-        "3rd": (3,4), "4th": (5,),
-        "5th": (7,), "6th": (8,9),
-        "7th": (10,11),
-    }
+    @property
+    def letter(self):
+        """The letter column (0 for C up to 6 for B, NoteArray.REST for rests)."""
+        return self.__letter
 
-    __M_QUAL = ("2nd","3rd","6th","7th")
+    @property
+    def offset(self):
+        """The accidental offset column, positive for sharps and negative for flats."""
+        return self.__offset
 
-    __QUALITY_REGEX = r'(maj|min|per)$|(aug|dim)[\d]*$'
+    @property
+    def octave(self):
+        """The octave column (NoteArray.NO_OCTAVE where no octave was given)."""
+        return self.__octave
 
-    __base_err = "Base interval must be a valid string. (see Interval.BASES)"
-    __quality_err = (
-        "Quality must be 'maj','min','per','aug', or 'dim'."
-        "\n Augmented and diminished intervals may be increased by adding an integer,"
-         "such as 'aug2' for doubly augmented."
-         )
-    __base_qual_err1 = "2nd/3rd/6th/7th cannot be perfect."
-    __base_qual_err2 = "uni/4th/5th cannot be major or minor."
-    __dis_err = "Displacement of octave must be a positive integer."
+    @property
+    def rhythm(self):
+        """The column of integer rhythm values (see Note.RHYTHM_SETTER_VALUES)."""
+        return self.__rhythm
 
-    def __init__(self,quality,base,displace=0):
+    @property
+    def dots(self):
+        """The column of dot counts."""
+        return self.__dots
 
-        if type(base) is not str:
-            raise ValueError(Interval.__base_err)
-        base = base.strip().lower()
-        if base not in Interval.__BASE_INTERVALS:
-            raise ValueError(Interval.__base_err)
-        if type(quality) is not str:
-            raise ValueError(Interval.__quality_err)
-        quality = quality.strip().lower()
-        if not match(Interval.__QUALITY_REGEX,quality):
-            raise ValueError(Interval.__quality_err)
-        if base in Interval.__M_QUAL and quality == "per":
-            raise ValueError(Interval.__base_qual_err1)
-        elif base not in Interval.__M_QUAL and quality[0] == "m":
-            raise ValueError(Interval.__base_qual_err2)
-        if type(displace) is not int:
-            raise ValueError(Interval.__dis_err)
-        if displace < 0:
-            raise ValueError(Interval.__dis_err)
-        
-        self.__quality = quality
-        self.__base = base
-        self.__displace = displace
+    @property
+    def triplet(self):
+        """The triplet column, 1 for a 3:2 triplet and 0 otherwise."""
+        return self.__triplet
 
-        self._lock()
+    @property
+    def is_rest(self):
+        """A Boolean array, True where the note is a rest."""
+        return self.__letter == NoteArray.REST
 
     @property
-    def quality(self):
-        """The quality originally given for the interval (str)"""
-        return self.__quality
+    def has_octave(self):
+        """A Boolean array, True where the note is pitched and has an octave value."""
+        return (self.__octave != NoteArray.NO_OCTAVE) & ~self.is_rest
 
     @property
-    def base(self):
-        """The base interval originally given for the interval (str)"""
-        return self.__base
-    
+    def pitch(self):
+        """The Note.pitch column, 0 to 11 (masked for rests)."""
+        pitch = np.array(NoteArray.__LETTER_PITCHES, dtype=np.int16)[self.__letter] + self.__offset
+        pitch = np.where(pitch > 11, pitch - 12, pitch)
+        pitch = np.where(pitch < 0, pitch + 12, pitch)
+        return np.ma.masked_array(pitch, mask=self.is_rest)
+
     @property
-    def displace(self):
-        """The orignal given number of octaves displaced (int)"""
-        return self.__displace
+    def sharps(self):
+        """The Note.sharps column (masked for rests)."""
+        return np.ma.masked_array(np.maximum(self.__offset, 0), mask=self.is_rest)
 
     @property
-    def pitch_difference(self):
-        """Returns the difference in pitch of the interval measured in half steps (int)"""
-        if self.quality == "per" or self.quality == "min":
-            return Interval.__BASE_INTERVALS[self.base][0] + 12 * self.displace
-        if self.quality == "maj":
-            return Interval.__BASE_INTERVALS[self.base][1] + 12 * self.displace
-        if self.quality[:3] == "aug":
-            if len(self.quality) > 3:
-                more = int(self.quality[3:]) if self.quality[3:] != "0" else 1
-            else:
-                more = 1
-            if self.base in Interval.__M_QUAL:
-                return Interval.__BASE_INTERVALS[self.base][1] + more + 12 * self.displace
-            else:
-                return Interval.__BASE_INTERVALS[self.base][0] + more + 12 * self.displace
-        elif self.quality[:3] == "dim":
-            if len(self.quality) > 3:
-                less = int(self.quality[3:]) if self.quality[3:] != "0" else 1
-            else:
-                less = 1
-            return Interval.__BASE_INTERVALS[self.base][0] - less + 12 * self.displace
-    
+    def flats(self):
+        """The Note.flats column (masked for rests)."""
+        return np.ma.masked_array(np.maximum(-self.__offset, 0), mask=self.is_rest)
+
     @property
-    def letter_difference(self):
-        """The number of note letter degrees changed by the interval."""
-        return Interval.BASES.index(self.base)
+    def hard_pitch(self):
+        """The Note.hard_pitch column (masked for rests and notes without an octave)."""
+        hard_pitch = self.pitch.data.astype(np.int64) + self.__octave.astype(np.int64) * 12
+        return np.ma.masked_array(hard_pitch, mask=~self.has_octave)
 
+    @property
+    def frequency(self):
+        """
+        | The Note.frequency column in Hz (masked for rests and notes without an octave).
+        |
+        | Each distinct note is looked up once in the current tuning (see set_tuning), exactly as Note.frequency does.
+        """
+        return get_tuning().frequencies(self)
 
     @property
     def name(self):
-        """A name for the interval more pleasing to the eye (str)"""
-        if self.base == "uni" and self.quality == "per" and self.displace > 1:
-            return f"{self.displace} octaves"
-        if self.displace == 1:
-            if self.base == "uni":
-                base = "octave"
-            else:
-                base = str(int(self.base[0]) + 7) + "th"
-        elif self.base == "uni":
-            base = "unison"
-        else:
-            base = self.base
-        if self.quality == "maj":
-            quality = "Major"
-        elif self.quality == "min":
-            quality = "Minor"
-        elif self.quality == "per":
-            quality = "Perfect"
-        elif self.quality[:3] == "aug":
-            quality = "Augmented"
+        """
+        | The Note.name column, as an array of strings.
+        |
+        | Each distinct combination of values is named once, so repeated notes cost nothing extra.
+        """
+        octave = np.where(self.has_octave, self.__octave, NoteArray.NO_OCTAVE)
+        rows = np.stack((self.__letter, self.__offset, octave, self.__rhythm, self.__dots, self.__triplet), axis=1)
+        unique, inverse = np.unique(rows, axis=0, return_inverse=True)
+        names = np.empty(len(unique), dtype=object)
+        names[:] = [NoteArray.__note(*row).name for row in unique.tolist()]
+        return names[inverse.reshape(-1)]
+
+    @classmethod
+    def __note(self,letter,offset,octave,rhythm,dots,triplet):
+        if letter == NoteArray.REST:
+            name = "R"
         else:
-            quality = "Diminished"
-        if len(self.quality) > 3:
-            times = f"(x{self.quality[3:]})"
+            name = NoteArray.__LETTERS[letter] + ("#" * offset if offset > 0 else "b" * -offset)
+        if octave == NoteArray.NO_OCTAVE:
+            octave = None
+        return Note._from_fields(name,octave,rhythm,dots,bool(triplet))
+
+    #Letter and offset for each pitch class, spelled with sharps or with flats, as in Note.from_hard_pitch
+    __SHARP_SPELLINGS = ((0,0),(0,1),(1,0),(1,1),(2,0),(2,1),(3,1),(4,0),(4,1),(5,0),(5,1),(6,0))
+    __FLAT_SPELLINGS = ((0,0),(1,-1),(1,0),(2,-1),(2,0),(3,0),(4,-1),(4,0),(5,-1),(5,0),(6,-1),(6,0))
+    #For pitch classes outside a key: naturals where there is one, sharps otherwise (no E# for F, unlike from_hard_pitch)
+    __KEY_SHARP_SPELLINGS = ((0,0),(0,1),(1,0),(1,1),(2,0),(3,0),(3,1),(4,0),(4,1),(5,0),(5,1),(6,0))
+
+    @classmethod
+    def from_hard_pitches(self,hard_pitch,prefer_flat=False,key=None):
+        """
+        | Returns a NoteArray (octave valued) matching an array of hard pitch values.
+        | Spelled the same way as Note.from_hard_pitch: sharps, unless prefer_flat is set to True.
+        | With a Mode as 'key', the pitch classes of the Mode are spelled the way the Mode spells them,
+        | and the others as naturals where they have one (F, not E#), otherwise with sharps,
+        | or with flats if prefer_flat is True or the Mode's spelling has any flats.
+        """
+        if type(prefer_flat) is not bool:
+            raise ValueError("prefer_flat must be Boolean.")
+        if key is not None and type(key) is not Mode:
+            raise ValueError("The key must be a Mode object.")
+        hard_pitch = np.asarray(hard_pitch)
+        if hard_pitch.dtype.kind not in "iu":
+            raise ValueError("Hard pitch values must be integers.")
+        octave, pitch = np.divmod(hard_pitch.astype(np.int64, copy=False).reshape(-1), 12)
+        if key is None:
+            spellings = NoteArray.__FLAT_SPELLINGS if prefer_flat else NoteArray.__SHARP_SPELLINGS
         else:
-            times = ""
-        name = quality + times + " " + base
-        if self.displace > 1:
-            name += f" plus {self.displace} octaves"
-        return name
-        
-    __SIMPLE_INTVLS = (
-        ("per","uni"),("min","2nd"),
-        ("maj","2nd"),("min","3rd"),
+            notes = key.spelling
+            prefer_flat = prefer_flat or any(note.flats for note in notes)
+            spellings = list(NoteArray.__FLAT_SPELLINGS if prefer_flat else NoteArray.__KEY_SHARP_SPELLINGS)
+            for note in notes:
+                spellings[note.pitch] = (note.letter,note.pitch_offset)
+        spellings = np.array(spellings, dtype=np.int8)
+        return NoteArray(spellings[pitch, 0], spellings[pitch, 1], octave)
+
+    @classmethod
+    def from_frequencies(self,Hz,prefer_flat=False):
+        """
+        | The batch version of Note.from_frequency.
+        |
+        | Takes an array of frequencies in Hz and returns a tuple of:
+        | - a NoteArray (octave valued) of the nearest notes, spelled as Note.from_frequency would
+        | - an array of the signed deviation of each frequency from its note, in cents (-50 to 50)
+        """
+        tuning = get_tuning()
+        if tuning is not EQUAL_TEMPERAMENT:
+            return tuning.from_frequencies(Hz,prefer_flat)
+        Hz = np.asarray(Hz, dtype=np.float64).reshape(-1)
+        if not np.all(Hz > 0):
+            raise ValueError("Please provide positive numbers for the Hz values.")
+        semitones = 12 * (np.log2(Hz) - np.log2(get_A4()))
+        nearest = np.rint(semitones)
+        cents = (semitones - nearest) * 100
+        notes = NoteArray.from_hard_pitches(nearest.astype(np.int64) + 57,prefer_flat=prefer_flat)
+        return notes, cents
+
+    @classmethod
+    def from_notes(self,notes):
+        """Returns a NoteArray holding the values of a sequence of Note objects."""
+        rows = []
+        for note in notes:
+            try:
+                assert note.class_name == "Note"
+            except:
+                raise ValueError("NoteArray.from_notes requires Note objects.")
+            if note.is_rest:
+                letter = NoteArray.REST
+                offset = 0
+            else:
+                letter = note.letter
+                offset = note.pitch_offset
+            octave = note.octave
+            rows.append((
+                letter,
+                offset,
+                NoteArray.NO_OCTAVE if octave is None else octave,
+                note._Note__rhythm or 0,
+                note.dots,
+                note.triplet,
+            ))
+        if not rows:
+            return NoteArray(())
+        letter, offset, octave, rhythm, dots, triplet = zip(*rows)
+        return NoteArray(letter,offset,octave,rhythm,dots,triplet)
+
+    def to_notes(self):
+        """Returns a list of new Note objects, one per entry."""
+        columns = (self.__letter, self.__offset, self.__octave, self.__rhythm, self.__dots, self.__triplet)
+        return [NoteArray.__note(*row) for row in zip(*(column.tolist() for column in columns))]
+
+    def __len__(self):
+        return len(self.__letter)
+
+    def __iter__(self):
+        return iter(self.to_notes())
+
+    def __getitem__(self,index):
+        """An integer index returns a Note object, and a slice or array index returns a NoteArray."""
+        if isinstance(index, (int, np.integer)):
+            return NoteArray.__note(
+                int(self.__letter[index]), int(self.__offset[index]), int(self.__octave[index]),
+                int(self.__rhythm[index]), int(self.__dots[index]), int(self.__triplet[index]),
+            )
+        return NoteArray(
+            self.__letter[index], self.__offset[index], self.__octave[index],
+            self.__rhythm[index], self.__dots[index], self.__triplet[index],
+        )
+
+class Tuning(_Meta):
+
+    """
+    | The base class of tuning systems.  A Tuning turns Notes into frequencies and frequencies back into Notes.
+    |
+    | Use one of EqualTemperament, RegularTuning, CentsTuning or RatioTuning (or a preset such as PYTHAGOREAN),
+    | and make it the one Note.frequency, Note.from_frequency and the NoteArray paths use with set_tuning().
+    | Every tuning is anchored to A4 (see set_A4), repeats at the octave, and keeps a table of frequency ratios
+    | for octaves 0 to 10, built on first use, so a frequency is a table lookup.  Nearest notes are found by bisection.
+    |
+    | Some tunings give every spelling its own pitch (C# and Db differ in meantone or 19-EDO); those are 'spelled'.
+    | The others tune by hard pitch, like 12-tone equal temperament, and spell notes the way Note.from_hard_pitch does.
+    """
+
+    class_name = "Tuning"
+
+    #Octaves covered by the precomputed tables
+    LOW_OCTAVE = 0
+    HIGH_OCTAVE = 10
+
+    __slots__ = ("__name", "__spelled", "__table", "__positions")
+
+    def __init__(self,name,spelled):
+        if type(spelled) is not bool:
+            raise ValueError("spelled must be Boolean.")
+        #The base class has no ratios of its own: a subclass defines the hook its kind of tuning is read through
+        hook = "_spelled_ratio" if spelled else "_pitch_ratio"
+        if getattr(type(self),hook) is getattr(Tuning,hook):
+            raise ValueError(f"A {'spelled' if spelled else 'hard pitch'} tuning must define {hook}; use a subclass of Tuning.")
+        self.__name = name
+        self.__spelled = spelled
+        self.__table = None
+        self.__positions = {}
+
+    @property
+    def name(self):
+        """A name describing the tuning (str)."""
+        return self.__name
+
+    @property
+    def spelled(self):
+        """True if enharmonic spellings (like C# and Db) can have different frequencies in this tuning."""
+        return self.__spelled
+
+    def _spelled_ratio(self,letter,offset,octave):
+        """The ratio of a note's frequency to A4, for spelled tunings."""
+        raise NotImplementedError
+
+    def _pitch_ratio(self,hard_pitch):
+        """The ratio of a hard pitch's frequency to A4, for tunings by hard pitch."""
+        raise NotImplementedError
+
+    def __build_table(self):
+        octaves = range(Tuning.LOW_OCTAVE,Tuning.HIGH_OCTAVE + 1)
+        if self.__spelled:
+            self.__table = {
+                (letter,offset,octave): self._spelled_ratio(letter,offset,octave)
+                for octave in octaves for letter in range(7) for offset in range(-2,3)
+            }
+        else:
+            self.__table = [self._pitch_ratio(hard_pitch) for hard_pitch in range(12 * len(octaves))]
+        return self.__table
+
+    def ratio(self,note):
+        """Returns the ratio of an octave-valued Note's frequency to A4, or None if it has no octave."""
+        octave = note.octave
+        if octave is None:
+            return None
+        table = self.__table or self.__build_table()
+        if self.__spelled:
+            if note.is_rest:
+                return None
+            (letter,offset) = _spelling(note.note_name)
+            ratio = table.get((letter,offset,octave))
+            if ratio is None:
+                ratio = self._spelled_ratio(letter,offset,octave)
+            return ratio
+        hard_pitch = note.hard_pitch
+        if 0 <= hard_pitch < len(table):
+            return table[hard_pitch]
+        return self._pitch_ratio(hard_pitch)
+
+    def frequency(self,note):
+        """Returns the frequency of a Note in Hz in this tuning (None if it has no octave), as Note.frequency does."""
+        ratio = self.ratio(note)
+        if ratio is None:
+            return None
+        return get_A4() * ratio
+
+    def frequencies(self,notes):
+        """Returns the frequency column of a NoteArray in this tuning, masked where NoteArray.frequency is masked."""
+        valid = notes.has_octave
+        frequency = np.zeros(len(notes),dtype=np.float64)
+        if self.__spelled:
+            rows = np.stack((notes.letter[valid],notes.offset[valid],notes.octave[valid]),axis=1).astype(np.int64)
+            unique, inverse = np.unique(rows,axis=0,return_inverse=True)
+            table = self.__table or self.__build_table()
+            ratios = [table.get(key) or self._spelled_ratio(*key) for key in map(tuple,unique.tolist())]
+        else:
+            unique, inverse = np.unique(notes.hard_pitch.data[valid],return_inverse=True)
+            ratios = [self.__hard_pitch_ratio(hard_pitch) for hard_pitch in unique.tolist()]
+        A4 = get_A4()
+        table = np.array([A4 * ratio for ratio in ratios],dtype=np.float64)
+        frequency[valid] = table[inverse.reshape(-1)]
+        return np.ma.masked_array(frequency,mask=~valid)
+
+    def __hard_pitch_ratio(self,hard_pitch):
+        table = self.__table or self.__build_table()
+        if 0 <= hard_pitch < len(table):
+            return table[hard_pitch]
+        return self._pitch_ratio(hard_pitch)
+
+    def __candidates(self,prefer_flat):
+        """
+        | The notes from_frequency can return, as sorted positions within an octave (in octaves above C4)
+        | with what to add to the octave of the query for each.  Built once per spelling preference.
+        """
+        positions = self.__positions.get(prefer_flat)
+        if positions is not None:
+            return positions
+        base = log2(self.__hard_pitch_ratio(48)) if not self.__spelled else log2(self._spelled_ratio(0,0,4))
+        candidates = []
+        if self.__spelled:
+            preferred = -1 if prefer_flat else 1
+            #Double sharps and flats too, as the table has them: 31-EDO needs them for all of its pitches
+            offsets = (0,preferred,-preferred,2 * preferred,-2 * preferred)
+            for letter in range(7):
+                for (preference,offset) in enumerate(offsets):
+                    position = log2(self._spelled_ratio(letter,offset,4)) - base
+                    candidates.append((position,preference,(letter,offset)))
+        else:
+            for pitch_class in range(12):
+                position = log2(self.__hard_pitch_ratio(48 + pitch_class)) - base
+                candidates.append((position,0,pitch_class))
+        entries = []
+        for (position,preference,spelling) in candidates:
+            octaves = position // 1
+            entries.append((position - octaves,preference,spelling,-int(octaves)))
+        entries.sort()
+        #Of notes at the same position, keep the preferred spelling
+        kept = []
+        for entry in entries:
+            if kept and entry[0] - kept[-1][0] < 1e-9:
+                if entry[1] < kept[-1][1]:
+                    kept[-1] = entry
+                continue
+            kept.append(entry)
+        #The first note again one octave up, so a query between the last note and the octave finds it
+        (position,preference,spelling,octaves) = kept[0]
+        kept.append((position + 1,preference,spelling,octaves + 1))
+        positions = ([entry[0] for entry in kept],[entry[2:] for entry in kept],base)
+        self.__positions[prefer_flat] = positions
+        return positions
+
+    def from_frequency(self,Hz,prefer_flat=False):
+        """
+        | Returns the octave-valued Note nearest to a frequency in Hz in this tuning, found by bisection.
+        | Where two spellings share a pitch, naturals come first, then sharps (flats if prefer_flat is True),
+        | then flats (sharps), then double sharps and double flats in the same order.
+        """
+        (note,cents) = self.nearest(Hz,prefer_flat)
+        return note
+
+    def nearest(self,Hz,prefer_flat=False):
+        """Returns a tuple of the Note nearest to a frequency in Hz (see from_frequency) and the deviation from it in cents."""
+        if type(Hz) is not int and type(Hz) is not float:
+            raise ValueError("Please provide a positive number for the Hz value.")
+        if Hz <= 0:
+            raise ValueError("Please provide a positive number for the Hz value.")
+        if type(prefer_flat) is not bool:
+            raise ValueError("prefer_flat must be Boolean.")
+        (positions,spellings,base) = self.__candidates(prefer_flat)
+        position = log2(Hz) - log2(get_A4()) - base
+        octave = position // 1
+        position -= octave
+        index = bisect_left(positions,position)
+        if index == len(positions) or (index and position - positions[index - 1] <= positions[index] - position):
+            index -= 1
+        cents = (position - positions[index]) * 1200
+        (spelling,octaves) = spellings[index]
+        octave = int(octave) + 4 + octaves
+        if self.__spelled:
+            (letter,offset) = spelling
+            name = "CDEFGAB"[letter] + ("#" * offset if offset > 0 else "b" * -offset)
+            return Note._make(name,octave), cents
+        return Note.from_hard_pitch(12 * octave + spelling,prefer_flat=prefer_flat), cents
+
+    def from_frequencies(self,Hz,prefer_flat=False):
+        """The batch version of nearest: returns a NoteArray of the nearest notes and an array of deviations in cents."""
+        if type(prefer_flat) is not bool:
+            raise ValueError("prefer_flat must be Boolean.")
+        Hz = np.asarray(Hz,dtype=np.float64).reshape(-1)
+        if not np.all(Hz > 0):
+            raise ValueError("Please provide positive numbers for the Hz values.")
+        (positions,spellings,base) = self.__candidates(prefer_flat)
+        positions = np.array(positions,dtype=np.float64)
+        position = np.log2(Hz) - log2(get_A4()) - base
+        octave = np.floor(position)
+        position -= octave
+        index = np.searchsorted(positions,position)
+        below = np.maximum(index - 1,0)
+        above = np.minimum(index,len(positions) - 1)
+        index = np.where((index > 0) & (position - positions[below] <= positions[above] - position),below,above)
+        cents = (position - positions[index]) * 1200
+        octaves = np.array([entry[1] for entry in spellings],dtype=np.int64)
+        octave = octave.astype(np.int64) + 4 + octaves[index]
+        if self.__spelled:
+            letters = np.array([entry[0][0] for entry in spellings],dtype=np.int8)
+            offsets = np.array([entry[0][1] for entry in spellings],dtype=np.int8)
+            return NoteArray(letters[index],offsets[index],octave), cents
+        pitch_classes = np.array([entry[0] for entry in spellings],dtype=np.int64)
+        return NoteArray.from_hard_pitches(12 * octave + pitch_classes[index],prefer_flat=prefer_flat), cents
+
+    def __repr__(self):
+        return f"<Tuning {self.__name}>"
+
+class RegularTuning(Tuning):
+
+    """
+    | A tuning generated by a chain of fifths of one size, with pure octaves: Pythagorean tuning, the meantones,
+    | and (with fifths of a whole number of steps) equal temperaments.
+    |
+    | 'fifth' is the size of the fifth in cents (700 in 12-tone equal temperament).
+    | Every spelling gets its own pitch: a whole step is two fifths less an octave, a sharp raises a note
+    | by seven fifths less four octaves.  A4 is tuned to get_A4().
+    """
+
+    class_name = "RegularTuning"
+
+    __slots__ = ("__fifth", "__naturals", "__chromatic")
+
+    def __init__(self,fifth,name=None):
+        self._set_fifth(fifth)
+        Tuning.__init__(self,name or f"regular, fifth of {fifth:g} cents",True)
+
+    def _set_fifth(self,fifth):
+        """Checks the size of the fifth and lays out the naturals and the chromatic step from it."""
+        if type(fifth) is not int and type(fifth) is not float:
+            raise ValueError("The fifth must be a number of cents.")
+        if not 600 < fifth < 800:
+            raise ValueError("The fifth must be between 600 and 800 cents.")
+        whole = 2 * fifth - 1200
+        half = 3600 - 5 * fifth
+        self.__fifth = fifth
+        self.__naturals = (0, whole, 2 * whole, 2 * whole + half, 3 * whole + half, 4 * whole + half, 5 * whole + half)
+        self.__chromatic = whole - half
+
+    @property
+    def fifth(self):
+        """The size of the fifth in cents."""
+        return self.__fifth
+
+    #Half steps of each natural above C, to place notes like B# and Cb in the octave Note.hard_pitch does
+    __NATURAL_PITCHES = (0,2,4,5,7,9,11)
+
+    def _spelled_ratio(self,letter,offset,octave):
+        wrap = (RegularTuning.__NATURAL_PITCHES[letter] + offset) // 12
+        cents = self.__naturals[letter] + offset * self.__chromatic + 1200 * (octave - wrap)
+        return 2 ** ((cents - self.__naturals[5] - 4800) / 1200)
+
+class EqualTemperament(RegularTuning):
+
+    """
+    | Equal temperament with 'divisions' equal steps to the octave (12 by default).
+    |
+    | Notes are placed by the equal temperament's best fifth (the number of steps nearest a pure fifth),
+    | so 19 or 31 divisions give C# and Db their own steps.  With 12 divisions enharmonic notes are the same,
+    | and frequencies are worked out from the hard pitch exactly as Note.frequency always has.
+    """
+
+    class_name = "EqualTemperament"
+
+    __slots__ = ("__divisions",)
+
+    def __init__(self,divisions=12):
+        if type(divisions) is not int or divisions < 5:
+            raise ValueError("Divisions must be an integer of 5 or more.")
+        steps = round(divisions * log2(3 / 2))
+        self._set_fifth(steps * 1200 / divisions)
+        #12 divisions tune by hard pitch instead of by spelling
+        Tuning.__init__(self,f"{divisions}-tone equal temperament",divisions != 12)
+        self.__divisions = divisions
+
+    @property
+    def divisions(self):
+        """The number of equal steps to the octave."""
+        return self.__divisions
+
+    def _pitch_ratio(self,hard_pitch):
+        return 2 ** ((hard_pitch - 57) / 12)
+
+class CentsTuning(Tuning):
+
+    """
+    | A tuning given as a table of 12 cents values, one per pitch class from C to B, measured up from C.
+    | It is tuned by hard pitch, and the 'anchor' pitch class (A by default) keeps its equal-tempered frequency
+    | relative to A4, with the other pitch classes placed around it by the table.
+    """
+
+    class_name = "CentsTuning"
+
+    __slots__ = ("__cents", "__anchor")
+
+    def __init__(self,cents,anchor=9,name=None):
+        cents = tuple(cents)
+        if len(cents) != 12:
+            raise ValueError("A cents table needs a value for each of the 12 pitch classes.")
+        for value in cents:
+            if type(value) is not int and type(value) is not float:
+                raise ValueError("Cents values must be numbers.")
+        if type(anchor) is not int or anchor not in range(12):
+            raise ValueError("The anchor must be a pitch class between 0 and 11.")
+        Tuning.__init__(self,name or "cents table",False)
+        self.__cents = cents
+        self.__anchor = anchor
+
+    @property
+    def cents(self):
+        """The cents value of each pitch class above C."""
+        return self.__cents
+
+    @property
+    def anchor(self):
+        """The pitch class that keeps its equal-tempered frequency."""
+        return self.__anchor
+
+    def _pitch_ratio(self,hard_pitch):
+        (octave,pitch_class) = divmod(hard_pitch,12)
+        steps = (self.__cents[pitch_class] - self.__cents[self.__anchor]) / 100 + (self.__anchor - 9) + 12 * (octave - 4)
+        return 2 ** (steps / 12)
+
+class RatioTuning(CentsTuning):
+
+    """
+    | A tuning given as 12 frequency ratios above a tonic pitch class, one for each half step (1 for the tonic itself),
+    | as in just intonation.  The tonic keeps its equal-tempered frequency relative to A4.
+    """
+
+    class_name = "RatioTuning"
+
+    __slots__ = ("__ratios", "__tonic")
+
+    def __init__(self,ratios,tonic=0,name=None):
+        ratios = tuple(ratios)
+        if len(ratios) != 12:
+            raise ValueError("A ratio table needs a ratio for each of the 12 half steps above the tonic.")
+        for ratio in ratios:
+            if not isinstance(ratio,(int,float,Fraction)) or not 1 <= ratio < 2:
+                raise ValueError("Ratios must be numbers from 1 up to (not including) 2.")
+        if ratios[0] != 1:
+            raise ValueError("The first ratio is the tonic's own, so it must be 1.")
+        if type(tonic) is not int or tonic not in range(12):
+            raise ValueError("The tonic must be a pitch class between 0 and 11.")
+        cents = [0] * 12
+        for (step,ratio) in enumerate(ratios):
+            pitch_class = (tonic + step) % 12
+            cents[pitch_class] = 100 * tonic + 1200 * log2(ratio) - (1200 if tonic + step >= 12 else 0)
+        CentsTuning.__init__(self,cents,tonic,name or "ratio table")
+        self.__ratios = ratios
+        self.__tonic = tonic
+
+    @property
+    def ratios(self):
+        """The ratio of each half step above the tonic."""
+        return self.__ratios
+
+    @property
+    def tonic(self):
+        """The pitch class the ratios are measured from."""
+        return self.__tonic
+
+EQUAL_TEMPERAMENT = EqualTemperament(12)
+PYTHAGOREAN = RegularTuning(1200 * log2(3 / 2),"Pythagorean")
+QUARTER_COMMA_MEANTONE = RegularTuning(1200 * log2(5) / 4,"quarter-comma meantone")
+EDO19 = EqualTemperament(19)
+EDO31 = EqualTemperament(31)
+JUST_INTONATION = RatioTuning(
+    (1, Fraction(16,15), Fraction(9,8), Fraction(6,5), Fraction(5,4), Fraction(4,3),
+     Fraction(45,32), Fraction(3,2), Fraction(8,5), Fraction(5,3), Fraction(9,5), Fraction(15,8)),
+    name="5-limit just intonation on C",
+)
+
+__tuning = EQUAL_TEMPERAMENT
+
+def get_tuning():
+    """
+    | Returns the Tuning used by Note.frequency, Note.from_frequency and the NoteArray frequency paths:
+    | the one set by the current 'with tuning(tuning=...)' block, or else set_tuning's.
+    """
+    context = _pitch_context.get()
+    if context is None or context[1] is None:
+        return __tuning
+    return context[1]
+
+def _check_tuning(tuning):
+    if not isinstance(tuning,Tuning):
+        raise ValueError("Tuning must be a Tuning object, such as EQUAL_TEMPERAMENT or PYTHAGOREAN.")
+
+def set_tuning(tuning):
+    """
+    | Sets the process-wide default Tuning (EQUAL_TEMPERAMENT to begin with).
+    | Code inside a 'with tuning(tuning=...)' block keeps using that block's Tuning.
+    """
+    _check_tuning(tuning)
+    global __tuning
+    __tuning = tuning
+
+@contextmanager
+def tuning(A4=None,tuning=None):
+    """
+    | Sets A4 (in Hz) and/or the Tuning for the code inside a with block, for example:
+    |     with musictools.tuning(A4=442):
+    |         Note("A",4).frequency    #442.0
+    |
+    | The values are held in a context variable, so they only apply to the thread or asyncio task that runs
+    | the block (and tasks it starts), never to concurrent ones.  Blocks can be nested; a value left as None
+    | is taken from the enclosing block, or from set_A4/set_tuning outside any block.
+    """
+    if A4 is not None:
+        _check_A4(A4)
+    if tuning is not None:
+        _check_tuning(tuning)
+    outer = _pitch_context.get()
+    if outer is not None:
+        if A4 is None:
+            A4 = outer[0]
+        if tuning is None:
+            tuning = outer[1]
+    token = _pitch_context.set((A4,tuning))
+    try:
+        yield
+    finally:
+        _pitch_context.reset(token)
+
+class Interval(_Meta):
+
+    class_name = "Interval"
+
+    """
+    | Use this class to create Interval objects, or take advantage of its class methods.
+    | 
+    | For the 'quality', use "maj"(major), "min"(minor), "per"(perfect), "aug"(augmented), or "dim"(diminished).
+    | 
+    | For the 'base', use "uni"(unison),"2nd","3rd","4th", and so on up to "7th."
+    | 
+    | Set 'displace' to a number to displace an interval by a number of octaves.
+    | For example, a unison that is displaced by 1 is the same as a perfect octave.
+    """
+
+    class_name = "Interval"
+
+    BASES = (
+        "uni", "2nd", "3rd", 
+        "4th", "5th", "6th", 
+        "7th",
+    )
+
+    __BASE_INTERVALS = {
+        "uni": (0,), "2nd": (1,2),
+        "3rd": (3,4), "4th": (5,),
+        "5th": (7,), "6th": (8,9),
+        "7th": (10,11),
+    }
+
+    __M_QUAL = ("2nd","3rd","6th","7th")
+
+    __BASE_INDEX = {base: index for (index,base) in enumerate(BASES)}
+
+    #Each valid quality string with its kind and how many half steps an augmented or diminished quality moves by.
+    #Qualities like 'aug3' are added the first time they are used.
+    __QUALITIES = {
+        "maj": ("maj",0), "min": ("min",0), "per": ("per",0),
+        "aug": ("aug",1), "dim": ("dim",1),
+    }
+
+    __base_err = "Base interval must be a valid string. (see Interval.BASES)"
+    __quality_err = (
+        "Quality must be 'maj','min','per','aug', or 'dim'."
+        "\n Augmented and diminished intervals may be increased by adding an integer,"
+         "such as 'aug2' for doubly augmented."
+         )
+    __base_qual_err1 = "2nd/3rd/6th/7th cannot be perfect."
+    __base_qual_err2 = "uni/4th/5th cannot be major or minor."
+    __dis_err = "Displacement of octave must be a positive integer."
+
+    __slots__ = ("__quality", "__base", "__displace", "__pitch_difference", "__letter_difference", "__name")
+
+    def __init__(self,quality,base,displace=0):
+
+        if type(base) is not str:
+            raise ValueError(Interval.__base_err)
+        base = base.strip().lower()
+        letter_difference = Interval.__BASE_INDEX.get(base)
+        if letter_difference is None:
+            raise ValueError(Interval.__base_err)
+        if type(quality) is not str:
+            raise ValueError(Interval.__quality_err)
+        quality = quality.strip().lower()
+        parsed = Interval.__QUALITIES.get(quality)
+        if parsed is None:
+            parsed = Interval.__parse_quality(quality)
+        (kind,amount) = parsed
+        if base in Interval.__M_QUAL and kind == "per":
+            raise ValueError(Interval.__base_qual_err1)
+        elif base not in Interval.__M_QUAL and (kind == "maj" or kind == "min"):
+            raise ValueError(Interval.__base_qual_err2)
+        if type(displace) is not int:
+            raise ValueError(Interval.__dis_err)
+        if displace < 0:
+            raise ValueError(Interval.__dis_err)
+
+        sizes = Interval.__BASE_INTERVALS[base]
+        if kind == "maj":
+            pitch_difference = sizes[1]
+        elif kind == "aug":
+            pitch_difference = sizes[-1] + amount
+        elif kind == "dim":
+            pitch_difference = sizes[0] - amount
+        else:
+            pitch_difference = sizes[0]
+
+        self.__quality = quality
+        self.__base = base
+        self.__displace = displace
+        self.__pitch_difference = pitch_difference + 12 * displace
+        self.__letter_difference = letter_difference
+        self.__name = None
+
+    @classmethod
+    def __parse_quality(self,quality):
+        """Reads an augmented or diminished quality with a number, like 'aug2' or 'dim3', into (kind, amount)."""
+        kind = quality[:3]
+        number = quality[3:]
+        if kind not in ("aug","dim") or not number.isdecimal():
+            raise ValueError(Interval.__quality_err)
+        #'aug0' and 'dim0' have always meant the same as 'aug' and 'dim'
+        parsed = (kind,int(number) if number != "0" else 1)
+        if len(number) < 3:
+            Interval.__QUALITIES[quality] = parsed
+        return parsed
+
+    @classmethod
+    def __describe(self,quality,base,displace):
+        """Works out the name of an interval (see Interval.name)."""
+        kind = quality[:3]
+        if base == "uni" and kind == "per" and displace > 1:
+            return f"{displace} octaves"
+        if displace == 1:
+            if base == "uni":
+                base = "octave"
+            else:
+                base = str(int(base[0]) + 7) + "th"
+        elif base == "uni":
+            base = "unison"
+        name = Interval.__QUALITY_NAMES[kind]
+        if len(quality) > 3:
+            name += f"(x{quality[3:]})"
+        name += " " + base
+        if displace > 1:
+            name += f" plus {displace} octaves"
+        return name
+
+    __QUALITY_NAMES = {
+        "maj": "Major", "min": "Minor", "per": "Perfect",
+        "aug": "Augmented", "dim": "Diminished",
+    }
+
+    @classmethod
+    def _make(self,quality,base,displace=0):
+        """Returns an Interval, taken from the shared pool while interning is on."""
+        pool = _interval_pool()
+        if pool is None:
+            return Interval(quality,base,displace)
+        key = (quality,base,displace)
+        interval = pool.get(key)
+        if interval is None:
+            interval = Interval(quality,base,displace)
+            pool.put(key,interval)
+        return interval
+
+    @property
+    def quality(self):
+        """The quality originally given for the interval (str)"""
+        return self.__quality
+
+    @property
+    def base(self):
+        """The base interval originally given for the interval (str)"""
+        return self.__base
+    
+    @property
+    def displace(self):
+        """The orignal given number of octaves displaced (int)"""
+        return self.__displace
+
+    @property
+    def pitch_difference(self):
+        """Returns the difference in pitch of the interval measured in half steps (int)"""
+        return self.__pitch_difference
+
+    @property
+    def letter_difference(self):
+        """The number of note letter degrees changed by the interval."""
+        return self.__letter_difference
+
+    @property
+    def name(self):
+        """A name for the interval more pleasing to the eye (str)"""
+        if self.__name is None:
+            self.__name = Interval.__describe(self.__quality,self.__base,self.__displace)
+        return self.__name
+
+    __SIMPLE_INTVLS = (
+        ("per","uni"),("min","2nd"),
+        ("maj","2nd"),("min","3rd"),
         ("maj","3rd"),("per","4th"),
         ("aug","4th"),("per","5th"),
         ("min","6th"),("maj","6th"),
@@ -686,7 +1677,7 @@ class Interval(_Meta):
                 pitch_diff = note_obj2.pitch - note_obj1.pitch
             else:
                 pitch_diff = note_obj1.pitch - note_obj2.pitch
-            return Interval(Interval.__SIMPLE_INTVLS[pitch_diff][0],Interval.__SIMPLE_INTVLS[pitch_diff][1])
+            return Interval._make(Interval.__SIMPLE_INTVLS[pitch_diff][0],Interval.__SIMPLE_INTVLS[pitch_diff][1])
 
         if not note_obj1.octave or not note_obj2.octave:
             raise ValueError("Interval cannot be determined for Notes with no octave values, unless 'simple' parameter is set.")
@@ -728,9 +1719,513 @@ class Interval(_Meta):
             else:
                 quality = f"aug{offset}" if aug else f"dim{offset}"
         
-        return Interval(quality,base,displace=displace)
+        return Interval._make(quality,base,displace)
+
+class IntervalMatrix(_Meta):
+
+    """
+    | The intervals between many pairs of notes, computed all at once with NumPy.  Create one with a class method.
+    |
+    | Every cell holds what Interval.from_notes would return for its pair, as four integer arrays:
+    | 'semitones', the distance between the notes in half steps,
+    | 'letters', the letter difference (0 for a unison up to 6 for a 7th, see Interval.BASES),
+    | 'quality', half steps above the minor (2nd/3rd/6th/7th) or perfect (uni/4th/5th) size,
+    | so 0 is minor or perfect, 1 is major on a 2nd/3rd/6th/7th, and higher or negative values are augmented or diminished,
+    | 'displace', the number of octaves displaced.
+    |
+    | Index it with one integer per dimension to get the Interval of a cell.
+    """
+
+    class_name = "IntervalMatrix"
+
+    __slots__ = ("__semitones", "__letters", "__quality", "__displace")
+
+    #Half steps in the minor or perfect size of each base, indexed like Interval.BASES
+    __SMALLEST = (0,1,3,5,7,8,10)
+
+    def __init__(self,semitones,letters,quality,displace):
+        self.__semitones = semitones
+        self.__letters = letters
+        self.__quality = quality
+        self.__displace = displace
+
+    @property
+    def semitones(self):
+        """The distance between each pair in half steps."""
+        return self.__semitones
+
+    @property
+    def letters(self):
+        """The letter difference of each interval (its index in Interval.BASES)."""
+        return self.__letters
+
+    @property
+    def quality(self):
+        """The quality code of each interval (see the class description)."""
+        return self.__quality
+
+    @property
+    def displace(self):
+        """The number of octaves each interval is displaced."""
+        return self.__displace
+
+    @property
+    def shape(self):
+        """The shape of the matrix, as a tuple."""
+        return self.__semitones.shape
+
+    @classmethod
+    def from_notes(self,notes,other=None):
+        """
+        | Returns the matrix of Interval.from_notes(notes[i], other[j]) for every i and j.
+        | 'notes' and 'other' are NoteArrays or sequences of Note objects, all with octave values;
+        | 'other' defaults to 'notes', giving every pairwise interval between them.
+        """
+        (hard_pitch, letter) = IntervalMatrix.__columns(notes)
+        if other is None:
+            (other_hard_pitch, other_letter) = (hard_pitch, letter)
+        else:
+            (other_hard_pitch, other_letter) = IntervalMatrix.__columns(other)
+        return IntervalMatrix.__compute(hard_pitch[:,None],letter[:,None],other_hard_pitch[None,:],other_letter[None,:])
+
+    @classmethod
+    def from_sonorities(self,notes,voices):
+        """
+        | Returns the pairwise interval matrices of a series of sonorities, each made of 'voices' notes in a row of 'notes'.
+        | 'notes' is a NoteArray or sequence of Note objects whose length is a multiple of 'voices'.
+        | Cell (k, i, j) is Interval.from_notes between voices i and j of sonority k.
+        """
+        if type(voices) is not int or voices < 1:
+            raise ValueError("voices must be a positive integer.")
+        (hard_pitch, letter) = IntervalMatrix.__columns(notes)
+        if len(hard_pitch) % voices:
+            raise ValueError("The number of notes must be a multiple of the number of voices.")
+        hard_pitch = hard_pitch.reshape(-1,voices)
+        letter = letter.reshape(-1,voices)
+        return IntervalMatrix.__compute(hard_pitch[:,:,None],letter[:,:,None],hard_pitch[:,None,:],letter[:,None,:])
+
+    @classmethod
+    def __columns(self,notes):
+        if type(notes) is not NoteArray:
+            notes = NoteArray.from_notes(notes)
+        #Like Interval.from_notes, octave 0 counts as having no octave value
+        if not np.all(notes.has_octave & (notes.octave != 0)):
+            raise ValueError("Interval cannot be determined for Notes with no octave values, unless 'simple' parameter is set.")
+        return notes.hard_pitch.data, notes.letter.astype(np.int64)
+
+    @classmethod
+    def __compute(self,hard_pitch1,letter1,hard_pitch2,letter2):
+        #The second note is the higher one only when its hard pitch is strictly greater, as in Interval.from_notes
+        second_higher = hard_pitch2 > hard_pitch1
+        semitones = np.abs(hard_pitch2 - hard_pitch1)
+        letters = np.where(second_higher,letter2 - letter1,letter1 - letter2) % 7
+        displace, pitch_diff = np.divmod(semitones,12)
+        quality = pitch_diff - np.array(IntervalMatrix.__SMALLEST,dtype=np.int64)[letters]
+        return IntervalMatrix(semitones,letters.astype(np.int8),quality.astype(np.int8),displace)
+
+    @staticmethod
+    def quality_name(letters,quality):
+        """Returns the quality string (as used by Interval) for a letter difference and quality code."""
+        if Interval.BASES[letters] in ("uni","4th","5th"):
+            if quality == 0:
+                return "per"
+            offset = quality
+        else:
+            if quality == 0:
+                return "min"
+            if quality == 1:
+                return "maj"
+            offset = quality - 1 if quality > 1 else quality
+        if offset > 0:
+            return "aug" if offset == 1 else f"aug{offset}"
+        return "dim" if offset == -1 else f"dim{-offset}"
+
+    def __getitem__(self,index):
+        letters = int(self.__letters[index])
+        return Interval._make(
+            IntervalMatrix.quality_name(letters,int(self.__quality[index])),
+            Interval.BASES[letters],
+            int(self.__displace[index]),
+        )
+
+    def to_intervals(self):
+        """Returns the matrix as nested lists of Interval objects, decoding each distinct cell once."""
+        cells = np.stack((self.__letters.astype(np.int64),self.__quality.astype(np.int64),self.__displace.astype(np.int64)),axis=-1)
+        unique, inverse = np.unique(cells.reshape(-1,3),axis=0,return_inverse=True)
+        decoded = np.empty(len(unique),dtype=object)
+        decoded[:] = [
+            Interval._make(IntervalMatrix.quality_name(letters,quality),Interval.BASES[letters],displace)
+            for (letters,quality,displace) in unique.tolist()
+        ]
+        return decoded[inverse.reshape(-1)].reshape(self.shape).tolist()
+
+_TRANSPOSITIONS = {}
+
+#The accidental offsets and intervals filled in by fill_transposition_table
+_TRANSPOSITION_OFFSETS = (-2,-1,0,1,2)
+_TRANSPOSITION_QUALITIES = ("per","maj","min","aug","dim")
+
+def _spelling(name):
+    """Returns (letter, accidental offset) for a note name."""
+    letter = "CDEFGAB".index(name[0])
+    if "#" in name:
+        return letter, len(name) - 1
+    return letter, 1 - len(name)
+
+def _transposition(letter,offset,base,quality):
+    """
+    | Returns the transposition table entry for a spelled note and an undisplaced interval.
+    | The entry is a tuple of:
+    |   (name, octave change) ascending and (name, octave change) descending for octave valued notes,
+    |   then the name ascending and the name descending for notes without an octave value (None where Note arithmetic raises).
+    | A displacement only moves octave valued notes by whole octaves, so it is added to the octave change by the caller,
+    | and the table stays bounded by the number of spellings and intervals.
+    """
+    key = (letter,offset,base,quality)
+    entry = _TRANSPOSITIONS.get(key)
+    if entry is not None:
+        return entry
+    name = "CDEFGAB"[letter] + ("#" * offset if offset > 0 else "b" * -offset)
+    interval = Interval(quality,base)
+    pitched = Note._from_fields(name,4)
+    ascending = pitched._ascend(interval)
+    descending = pitched._descend(interval)
+    simple = Note._from_fields(name)
+    entry = [ascending.note_name,ascending.octave - 4,descending.note_name,descending.octave - 4]
+    for transpose in (simple._ascend,simple._descend):
+        try:
+            entry.append(transpose(interval).note_name)
+        except ValueError:
+            entry.append(None)
+    entry = tuple(entry)
+    _TRANSPOSITIONS[key] = entry
+    return entry
+
+def fill_transposition_table():
+    """
+    | Fill the transposition table (see transpose) up front for the common spellings and intervals,
+    | so that no later transposition pays for filling an entry.
+    """
+    for letter in range(7):
+        for offset in _TRANSPOSITION_OFFSETS:
+            for base in Interval.BASES:
+                for quality in _TRANSPOSITION_QUALITIES:
+                    try:
+                        _transposition(letter,offset,base,quality)
+                    except ValueError:
+                        pass
+
+def _transpose_note(note,interval,descending):
+    name = note.note_name
+    if name == "R":
+        return note._descend(interval) if descending else note._ascend(interval)
+    letter, offset = _spelling(name)
+    entry = _transposition(letter,offset,interval.base,interval.quality)
+    displace = interval.displace
+    octave = note.octave
+    if octave:
+        if descending:
+            name, octave = entry[2], octave + entry[3] - displace
+        else:
+            name, octave = entry[0], octave + entry[1] + displace
+    else:
+        #Descending a displaced interval from a note without an octave never gives a pitch, so Note arithmetic raises
+        name = entry[5] if descending and not displace else None if descending else entry[4]
+        if name is None:
+            return note._descend(interval) if descending else note._ascend(interval)
+        octave = None
+    return Note._make(name,octave,note._Note__rhythm or 0,note.dots,note.triplet)
+
+def transpose(notes,interval,descending=False):
+    """
+    | Transpose notes up (or down, with descending=True) by an Interval object.
+    |
+    | Takes a Note, a NoteArray, or any sequence of Note objects, and returns the same kind of result
+    | (a list for sequences).  The spelled results match Note + Interval and Note - Interval.
+    | Rests are passed through unchanged.
+    |
+    | Results come from a table indexed by spelling and interval.  Each entry is worked out once,
+    | the first time it is needed (or ahead of time with fill_transposition_table), so after that
+    | transposing a note is one lookup instead of building and respelling new notes.
+    """
+    try:
+        assert interval.class_name == "Interval"
+    except:
+        raise ValueError("transpose requires an Interval object.")
+    if type(descending) is not bool:
+        raise ValueError("'descending' must be Boolean.")
+    if isinstance(notes,Note):
+        return _transpose_note(notes,interval,descending)
+    if isinstance(notes,NoteArray):
+        return _transpose_array(notes,interval,descending)
+    return [note if note.is_rest else _transpose_note(note,interval,descending) for note in notes]
+
+def _transpose_array(notes,interval,descending):
+    letter, offset, octave = notes.letter, notes.offset, notes.octave
+    pitched = ~notes.is_rest
+    pairs = np.unique(np.stack((letter[pitched], offset[pitched]), axis=1), axis=0)
+    new_letter = letter.copy()
+    new_offset = offset.copy()
+    new_octave = octave.copy()
+    with_octave = notes.has_octave & (octave != 0)
+    without_octave = pitched & ~with_octave
+    column = 2 if descending else 0
+    displace = -interval.displace if descending else interval.displace
+    for (pair_letter, pair_offset) in pairs.tolist():
+        entry = _transposition(pair_letter,pair_offset,interval.base,interval.quality)
+        rows = (letter == pair_letter) & (offset == pair_offset)
+        octave_rows = rows & with_octave
+        new_letter[octave_rows], new_offset[octave_rows] = _spelling(entry[column])
+        new_octave[octave_rows] += entry[column + 1] + displace
+        simple_rows = rows & without_octave
+        if simple_rows.any():
+            name = entry[5] if descending and not displace else None if descending else entry[4]
+            if name is None:
+                raise ValueError("Pitch argument should be an integer between 0 and 11, 0 for C natural (or equivalent), 1 for C#/Db, etc.")
+            new_letter[simple_rows], new_offset[simple_rows] = _spelling(name)
+            new_octave[simple_rows] = NoteArray.NO_OCTAVE
+    return NoteArray(new_letter,new_offset,new_octave,notes.rhythm,notes.dots,notes.triplet)
+
+def _rotate_mask(mask,semitones):
+    """Rotates a 12-bit pitch-class mask up by a number of half steps."""
+    semitones %= 12
+    return ((mask << semitones) | (mask >> (12 - semitones))) & 0xFFF
+
+#Spellings of each pitch class, for when no Note says how to spell it
+_PITCH_CLASS_NAMES = ("C","Db","D","Eb","E","F","F#","G","Ab","A","Bb","B")
+
+class PitchClassSet(_Meta):
+
+    """
+    | An immutable set of pitch classes (0 for C up to 11 for B), kept as a 12-bit integer mask.
+    |
+    | Create one from an iterable of pitch classes (integers) and/or Note objects, or from a mask integer.
+    | Mode.pitch_class_set and Chord.pitch_class_set return one, and their 'mask' is the same integer.
+    |
+    | Supports len(), iteration in ascending order, 'in' (with pitch classes or Notes), and the set operators
+    | | (union), & (intersection), - (difference), ^ (symmetric difference), ~ (complement), <= and >= (subset and superset).
+    """
+
+    class_name = "PitchClassSet"
+
+    __slots__ = ("__mask",)
+
+    def __init__(self,pitch_classes=()):
+        if type(pitch_classes) is int:
+            if pitch_classes not in range(4096):
+                raise ValueError("A pitch-class mask must be an integer between 0 and 4095.")
+            self.__mask = pitch_classes
+            return
+        mask = 0
+        for pitch_class in pitch_classes:
+            mask |= 1 << PitchClassSet.__pitch_class(pitch_class)
+        self.__mask = mask
+
+    @staticmethod
+    def __pitch_class(item):
+        if type(item) is Note:
+            if item.is_rest:
+                raise ValueError("A rest has no pitch class.")
+            return item.pitch
+        if type(item) is not int or item not in range(12):
+            raise ValueError("Pitch classes must be integers between 0 and 11 or Note objects.")
+        return item
+
+    @staticmethod
+    def _from_mask(mask):
+        """Makes a PitchClassSet without checking 'mask'."""
+        pitch_class_set = object.__new__(PitchClassSet)
+        pitch_class_set.__mask = mask
+        return pitch_class_set
+
+    @property
+    def mask(self):
+        """The 12-bit integer with bit n set when pitch class n is in the set."""
+        return self.__mask
+
+    @property
+    def pitch_classes(self):
+        """A tuple of the pitch classes in the set, in ascending order."""
+        return tuple(self)
+
+    def transpose(self,semitones):
+        """Returns the set moved up by a number of half steps (down if negative), wrapping around the octave."""
+        return PitchClassSet._from_mask(_rotate_mask(self.__mask,semitones))
+
+    def complement(self):
+        """Returns the pitch classes that are not in the set."""
+        return PitchClassSet._from_mask(self.__mask ^ 0xFFF)
+
+    def union(self,other):
+        """Returns the pitch classes in either set.  'other' can be a PitchClassSet, Mode, Chord, or anything PitchClassSet takes."""
+        return PitchClassSet._from_mask(self.__mask | PitchClassSet.__mask_of(other))
+
+    def intersection(self,other):
+        """Returns the pitch classes in both sets."""
+        return PitchClassSet._from_mask(self.__mask & PitchClassSet.__mask_of(other))
+
+    def difference(self,other):
+        """Returns the pitch classes in this set but not in 'other'."""
+        return PitchClassSet._from_mask(self.__mask & ~PitchClassSet.__mask_of(other))
+
+    def symmetric_difference(self,other):
+        """Returns the pitch classes in exactly one of the sets."""
+        return PitchClassSet._from_mask(self.__mask ^ PitchClassSet.__mask_of(other))
+
+    def issubset(self,other):
+        """True if every pitch class in this set is in 'other'."""
+        mask = PitchClassSet.__mask_of(other)
+        return self.__mask & mask == self.__mask
+
+    def issuperset(self,other):
+        """True if every pitch class in 'other' is in this set."""
+        mask = PitchClassSet.__mask_of(other)
+        return self.__mask & mask == mask
+
+    def isdisjoint(self,other):
+        """True if the sets share no pitch class."""
+        return not self.__mask & PitchClassSet.__mask_of(other)
+
+    @staticmethod
+    def __mask_of(other):
+        if type(other) is PitchClassSet:
+            return other.__mask
+        mask = getattr(other,"mask",None)
+        if type(mask) is int:
+            #A Mode or Chord
+            return mask
+        return PitchClassSet(other).__mask
+
+    def __or__(self,other):
+        if type(other) is not PitchClassSet:
+            return NotImplemented
+        return PitchClassSet._from_mask(self.__mask | other.__mask)
+
+    def __and__(self,other):
+        if type(other) is not PitchClassSet:
+            return NotImplemented
+        return PitchClassSet._from_mask(self.__mask & other.__mask)
+
+    def __sub__(self,other):
+        if type(other) is not PitchClassSet:
+            return NotImplemented
+        return PitchClassSet._from_mask(self.__mask & ~other.__mask)
+
+    def __xor__(self,other):
+        if type(other) is not PitchClassSet:
+            return NotImplemented
+        return PitchClassSet._from_mask(self.__mask ^ other.__mask)
+
+    def __invert__(self):
+        return PitchClassSet._from_mask(self.__mask ^ 0xFFF)
+
+    def __le__(self,other):
+        if type(other) is not PitchClassSet:
+            return NotImplemented
+        return self.__mask & other.__mask == self.__mask
+
+    def __lt__(self,other):
+        if type(other) is not PitchClassSet:
+            return NotImplemented
+        return self.__mask != other.__mask and self.__mask & other.__mask == self.__mask
+
+    def __ge__(self,other):
+        if type(other) is not PitchClassSet:
+            return NotImplemented
+        return self.__mask & other.__mask == other.__mask
+
+    def __gt__(self,other):
+        if type(other) is not PitchClassSet:
+            return NotImplemented
+        return self.__mask != other.__mask and self.__mask & other.__mask == other.__mask
+
+    def __contains__(self,item):
+        if type(item) is Note:
+            return not item.is_rest and bool(self.__mask >> item.pitch & 1)
+        if type(item) is int and item in range(12):
+            return bool(self.__mask >> item & 1)
+        return False
+
+    def __iter__(self):
+        mask = self.__mask
+        return (pitch_class for pitch_class in range(12) if mask >> pitch_class & 1)
+
+    def __len__(self):
+        return bin(self.__mask).count("1")
+
+    def __bool__(self):
+        return self.__mask != 0
+
+    def __eq__(self,other):
+        if type(other) is not PitchClassSet:
+            return NotImplemented
+        return self.__mask == other.__mask
+
+    def __hash__(self):
+        return hash(self.__mask)
+
+    def __repr__(self):
+        return f"PitchClassSet({self.pitch_classes})"
 
-MODES = {
+class _ObservedDict(dict):
+
+    """
+    | A dict that counts changes made to it and tells its listeners which keys changed,
+    | so that anything computed from its contents knows when to start over.
+    | A validator, if set, sees every new value first and can refuse it by raising.
+    """
+
+    version = 0
+    _validator = None
+    _listeners = ()
+
+    def _changed(self,keys):
+        self.version += 1
+        for listener in self._listeners:
+            listener(self,keys)
+
+    def __setitem__(self,key,value):
+        if self._validator:
+            self._validator(key,value)
+        dict.__setitem__(self,key,value)
+        self._changed((key,))
+
+    def __delitem__(self,key):
+        dict.__delitem__(self,key)
+        self._changed((key,))
+
+    def __ior__(self,other):
+        self.update(other)
+        return self
+
+    def update(self,*args,**kwargs):
+        for key, value in dict(*args,**kwargs).items():
+            self[key] = value
+
+    def setdefault(self,key,default=None):
+        if key in self:
+            return self[key]
+        self[key] = default
+        return default
+
+    def pop(self,key,*default):
+        if key not in self:
+            return dict.pop(self,key,*default)
+        value = dict.pop(self,key)
+        self._changed((key,))
+        return value
+
+    def popitem(self):
+        item = dict.popitem(self)
+        self._changed((item[0],))
+        return item
+
+    def clear(self):
+        keys = tuple(self)
+        dict.clear(self)
+        self._changed(keys)
+
+MODES = _ObservedDict({
     "ionian": (2,2,1,2,2,2,1),
     "major": "ionian1",
     "dorian": "ionian2",
@@ -761,16 +2256,428 @@ MODES = {
     "whole-half octatonic": "whole-half diminished1",
     "half-whole octatonic": "half-whole diminished1",
     "augmented": (3,1,3,1,3,1),
-}
+})
 
-MODE_LETTER_SPELLINGS = {
+MODE_LETTER_SPELLINGS = _ObservedDict({
     "ionian": (1,1,1,1,1,1,1),
     "major pentatonic": (1,1,2,1,2),
     "major blues": (1,0,1,2,1,2),
     "harmonic minor": (1,1,1,1,1,1,1),
     "melodic minor": (1,1,1,1,1,1,1),
     "augmented": (2,0,2,0,2,1),
-}
+})
+
+class CompiledMode(_Meta):
+
+    """
+    | The compiled form of one entry of MODES, as kept by a ModeRegistry.
+    |
+    | 'semitones' gives the distance of every scale degree from the root in half steps (0 for the root).
+    | 'letters' gives how many letters every degree is above the root's letter, or None when the mode's parent
+    | has no entry in MODE_LETTER_SPELLINGS (letters are then worked out per note).
+    | 'mask' is a 12-bit integer with bit n set when the mode has a degree n half steps above the root.
+    """
+
+    class_name = "CompiledMode"
+
+    __slots__ = ("__name", "__parent", "__rotation", "__steps", "__semitones", "__letters", "__mask")
+
+    def __init__(self,name,parent,rotation,steps,semitones,letters,mask):
+        self.__name = name
+        self.__parent = parent
+        self.__rotation = rotation
+        self.__steps = steps
+        self.__semitones = semitones
+        self.__letters = letters
+        self.__mask = mask
+
+    @property
+    def name(self):
+        """The mode's key in MODES."""
+        return self.__name
+
+    @property
+    def parent(self):
+        """The name of the mode whose step pattern this mode uses (its own name if it has one)."""
+        return self.__parent
+
+    @property
+    def rotation(self):
+        """Which degree of the parent this mode starts on, 1 for the parent itself."""
+        return self.__rotation
+
+    @property
+    def steps(self):
+        """The parent's step pattern, rotated to start on this mode's first degree."""
+        return self.__steps
+
+    @property
+    def semitones(self):
+        """A tuple of each degree's distance from the root in half steps."""
+        return self.__semitones
+
+    @property
+    def letters(self):
+        """A tuple of each degree's distance from the root in letters, or None."""
+        return self.__letters
+
+    @property
+    def mask(self):
+        """The 12-bit pitch-class mask of the mode on a root of C."""
+        return self.__mask
+
+class ModeRegistry:
+
+    """
+    | Keeps every entry of MODES compiled into tables (see CompiledMode), so that Mode never has to read
+    | MODES itself.  Modes are compiled once, when they are added to MODES or MODE_LETTER_SPELLINGS,
+    | and a new or changed entry that does not make a valid mode is refused there and then with a ValueError.
+    |
+    | Use MODE_REGISTRY rather than making one of your own.
+    """
+
+    __pattern_err = "Invalid Mode pattern. (Check MODES dictionary)"
+
+    def __init__(self,modes,letter_spellings):
+        self.__modes = modes
+        self.__letter_spellings = letter_spellings
+        self.__compiled = {}
+        self.__listeners = []
+        for name in modes:
+            self.__compiled[name] = ModeRegistry.compile(name,modes,letter_spellings)
+        modes._validator = self.__check_mode
+        modes._listeners = (self.__modes_changed,)
+        letter_spellings._validator = self.__check_letters
+        letter_spellings._listeners = (self.__letters_changed,)
+
+    @property
+    def modes(self):
+        """The MODES dictionary this registry compiles."""
+        return self.__modes
+
+    @property
+    def letter_spellings(self):
+        """The MODE_LETTER_SPELLINGS dictionary this registry compiles."""
+        return self.__letter_spellings
+
+    @classmethod
+    def parse_alias(self,pattern,modes):
+        """
+        | Splits an alias like 'melodic minor5' into its parent's name and rotation ('melodic minor', 5).
+        | Rotations can have any number of digits.  If a mode name itself ends in digits,
+        | the longest name found in 'modes' wins.
+        """
+        digits = len(pattern) - len(pattern.rstrip("0123456789"))
+        if digits == 0 or digits == len(pattern):
+            raise ValueError(ModeRegistry.__pattern_err)
+        for split in range(len(pattern) - 1, len(pattern) - digits - 1, -1):
+            if pattern[:split] in modes:
+                return pattern[:split], int(pattern[split:])
+        return pattern[:-digits], int(pattern[-digits:])
+
+    @classmethod
+    def compile(self,name,modes,letter_spellings):
+        """Compiles the entry 'name' of a MODES-like dictionary, raising a ValueError if it is not a valid mode."""
+        pattern = modes[name]
+        if type(pattern) is str:
+            parent_name, rotation = ModeRegistry.parse_alias(pattern,modes)
+        elif type(pattern) is tuple:
+            parent_name, rotation = name, 1
+        else:
+            raise ValueError(ModeRegistry.__pattern_err)
+        parent = modes.get(parent_name)
+        if type(parent) is not tuple or not parent:
+            raise ValueError(ModeRegistry.__pattern_err)
+        for step in parent:
+            if type(step) is not int or step not in range(12):
+                raise ValueError(ModeRegistry.__pattern_err)
+        if rotation not in range(1,len(parent) + 1):
+            raise ValueError(f"Mode '{name}' starts on degree {rotation}, but '{parent_name}' has {len(parent)} steps.")
+
+        offset = rotation - 1
+        steps = parent[offset:] + parent[:offset]
+        semitones = [0]
+        for step in steps[:-1]:
+            semitones.append(semitones[-1] + step)
+
+        letters = None
+        if parent_name in letter_spellings:
+            letter_steps = letter_spellings[parent_name]
+            ModeRegistry.__check_letter_steps(parent_name,letter_steps,parent)
+            letter_steps = letter_steps[offset:len(parent)] + letter_steps[:offset]
+            letters = [0]
+            for step in letter_steps[:-1]:
+                letters.append(letters[-1] + step)
+            letters = tuple(letters)
+
+        mask = 0
+        for semitone in semitones:
+            mask |= 1 << (semitone % 12)
+        return CompiledMode(name,parent_name,rotation,steps,tuple(semitones),letters,mask)
+
+    @classmethod
+    def __check_letter_steps(self,name,letter_steps,parent):
+        if type(letter_steps) is not tuple:
+            raise ValueError("Letter spellings must be tuples of integers. (Check MODE_LETTER_SPELLINGS dictionary)")
+        for step in letter_steps:
+            if type(step) is not int or step not in range(7):
+                raise ValueError("Letter spelling steps must be integers between 0 and 6. (Check MODE_LETTER_SPELLINGS dictionary)")
+        if parent is not None and len(letter_steps) < len(parent):
+            raise ValueError(f"The letter spelling for '{name}' needs a step for each of its {len(parent)} steps.")
+
+    def __dependents(self,names,modes):
+        """The names of every mode compiled from any of 'names' (including those modes themselves)."""
+        dependents = set(names)
+        for name, pattern in modes.items():
+            if name in dependents:
+                continue
+            if type(pattern) is str:
+                try:
+                    parent_name = ModeRegistry.parse_alias(pattern,modes)[0]
+                except ValueError:
+                    continue
+                if parent_name in names:
+                    dependents.add(name)
+        return dependents
+
+    def __check_mode(self,name,pattern):
+        modes = dict(self.__modes)
+        modes[name] = pattern
+        for dependent in self.__dependents((name,),modes):
+            if dependent == name or dependent in self.__compiled:
+                ModeRegistry.compile(dependent,modes,self.__letter_spellings)
+
+    def __check_letters(self,name,letter_steps):
+        parent = self.__modes.get(name)
+        ModeRegistry.__check_letter_steps(name,letter_steps,parent if type(parent) is tuple else None)
+
+    def add_listener(self,listener):
+        """
+        | Calls listener(registry, names) after modes are compiled again, with the set of names that changed.
+        | A name that is no longer in the registry was removed.
+        """
+        self.__listeners.append(listener)
+
+    def remove_listener(self,listener):
+        """Stops calling a listener added with add_listener."""
+        self.__listeners.remove(listener)
+
+    def __recompile(self,names):
+        changed = self.__dependents(names,self.__modes)
+        for name in changed:
+            self.__compiled.pop(name,None)
+            if name in self.__modes:
+                try:
+                    self.__compiled[name] = ModeRegistry.compile(name,self.__modes,self.__letter_spellings)
+                except ValueError:
+                    #An alias whose parent was removed; Mode raises when it is used
+                    pass
+        for listener in tuple(self.__listeners):
+            listener(self,frozenset(changed))
+
+    def __modes_changed(self,modes,names):
+        if modes is self.__modes:
+            self.__recompile(names)
+
+    def __letters_changed(self,letter_spellings,names):
+        if letter_spellings is self.__letter_spellings:
+            self.__recompile(names)
+
+    def __getitem__(self,name):
+        if name not in self.__modes:
+            raise KeyError("Mode not found.  View the MODES dictionary to see/add modes.")
+        try:
+            return self.__compiled[name]
+        except KeyError:
+            raise ValueError(ModeRegistry.__pattern_err)
+
+    def __contains__(self,name):
+        return name in self.__compiled
+
+    def __iter__(self):
+        return iter(self.__compiled)
+
+    def __len__(self):
+        return len(self.__compiled)
+
+    def containing(self,pitch_classes):
+        """
+        | Returns the names of every mode that contains all of the given pitch classes, in MODES order.
+        | Give pitch classes as integers counted in half steps above the root (0 to 11), a PitchClassSet, or a 12-bit mask integer.
+        """
+        if type(pitch_classes) is int:
+            mask = pitch_classes
+        elif type(pitch_classes) is PitchClassSet:
+            mask = pitch_classes.mask
+        else:
+            mask = 0
+            for pitch_class in pitch_classes:
+                mask |= 1 << (pitch_class % 12)
+        return [name for name, compiled in self.__compiled.items() if compiled.mask & mask == mask]
+
+MODE_REGISTRY = ModeRegistry(MODES,MODE_LETTER_SPELLINGS)
+
+def _compiled_mode(name):
+    """Returns the CompiledMode for a name in MODES, compiling on the spot if MODES was replaced by a plain dict."""
+    if MODES is MODE_REGISTRY.modes and MODE_LETTER_SPELLINGS is MODE_REGISTRY.letter_spellings:
+        return MODE_REGISTRY[name]
+    if name not in MODES:
+        raise KeyError("Mode not found.  View the MODES dictionary to see/add modes.")
+    return ModeRegistry.compile(name,MODES,MODE_LETTER_SPELLINGS)
+
+class ModeIndex:
+
+    """
+    | Finds the modes, on any of the 12 roots, that contain a set of pitch classes.
+    |
+    | Every compiled mode of a ModeRegistry is rotated to all 12 roots up front and grouped by pitch-class mask,
+    | so a query only compares the query's mask with each distinct mask, and answers are cached per query.
+    | The index follows the registry: when entries of MODES change, only those modes are indexed again.
+    |
+    | Results are ranked by fit: fewest missing tones (asked for but not in the mode), then fewest extra tones
+    | (in the mode but not asked for), then MODES order and root.  Use find_modes rather than making an index yourself.
+    """
+
+    def __init__(self,registry):
+        self.__registry = registry
+        self.__masks = {}
+        self.__by_mask = {}
+        self.__order = {}
+        self.__cache = _LRUCache(1024)
+        self.__index(registry)
+        if hasattr(registry,"add_listener"):
+            registry.add_listener(self.__registry_changed)
+
+    def __index(self,names):
+        for name in names:
+            if name not in self.__registry:
+                continue
+            mask = self.__registry[name].mask
+            self.__masks[name] = mask
+            for root in range(12):
+                self.__by_mask.setdefault(_rotate_mask(mask,root),[]).append((root,name))
+        self.__order = {name: position for (position,name) in enumerate(self.__registry)}
+        self.__cache.clear()
+
+    def __registry_changed(self,registry,names):
+        for name in names:
+            mask = self.__masks.pop(name,None)
+            if mask is None:
+                continue
+            for root in range(12):
+                rotated = _rotate_mask(mask,root)
+                entries = [entry for entry in self.__by_mask[rotated] if entry[1] != name]
+                if entries:
+                    self.__by_mask[rotated] = entries
+                else:
+                    del self.__by_mask[rotated]
+        self.__index(names)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.__by_mask.values())
+
+    def cache_info(self):
+        """Returns hit/miss counters and the size of the cache of answered queries."""
+        return self.__cache.info()
+
+    def lookup(self,mask,max_missing=0):
+        """
+        | Returns a tuple of (root pitch class, mode name, missing, extra) for the 12-bit 'mask',
+        | best fit first, leaving out modes missing more than 'max_missing' of its pitch classes.
+        """
+        key = (mask,max_missing)
+        results = self.__cache.get(key)
+        if results is None:
+            ranked = []
+            for (mode_mask,entries) in self.__by_mask.items():
+                missing = bin(mask & ~mode_mask).count("1")
+                if missing > max_missing:
+                    continue
+                extra = bin(mode_mask & ~mask).count("1")
+                for (root,name) in entries:
+                    ranked.append((missing,extra,self.__order[name],root,name))
+            ranked.sort()
+            results = tuple((root,name,missing,extra) for (missing,extra,order,root,name) in ranked)
+            self.__cache.put(key,results)
+        return results
+
+    def find(self,notes,max_missing=0):
+        """
+        | Returns a list of (root name, mode name, missing, extra) for the modes that contain 'notes', best fit first.
+        | 'notes' can be Note objects (rests are ignored), a PitchClassSet, or a 12-bit mask integer.
+        | Set 'max_missing' to also list modes that lack up to that many of the notes.
+        | Roots are spelled the way the given notes spell them.  The root name and mode name can be passed on as Mode(root, mode).
+        """
+        names = {}
+        if type(notes) is PitchClassSet:
+            mask = notes.mask
+        elif type(notes) is int:
+            mask = PitchClassSet(notes).mask
+        else:
+            mask = 0
+            for note in notes:
+                if type(note) is not Note:
+                    raise ValueError("Modes can only be found from Note objects, a PitchClassSet, or a mask.")
+                if note.is_rest:
+                    continue
+                mask |= 1 << note.pitch
+                names.setdefault(note.pitch,note.note_name)
+        if type(max_missing) is not int or max_missing < 0:
+            raise ValueError("max_missing must be a positive integer or 0.")
+        return [
+            (names.get(root,_PITCH_CLASS_NAMES[root]),name,missing,extra)
+            for (root,name,missing,extra) in self.lookup(mask,max_missing)
+        ]
+
+MODE_INDEX = ModeIndex(MODE_REGISTRY)
+
+def find_modes(notes,max_missing=0):
+    """
+    | Returns a ranked list of (root name, mode name, missing, extra) for every root and entry of MODES
+    | that contains 'notes' (Note objects, a PitchClassSet, or a mask).  See ModeIndex.find.
+    """
+    if MODES is MODE_REGISTRY.modes and MODE_LETTER_SPELLINGS is MODE_REGISTRY.letter_spellings:
+        return MODE_INDEX.find(notes,max_missing)
+    #MODES was replaced by a plain dict, so index it as it is now
+    compiled = {}
+    for name in MODES:
+        try:
+            compiled[name] = ModeRegistry.compile(name,MODES,MODE_LETTER_SPELLINGS)
+        except ValueError:
+            pass
+    return ModeIndex(compiled).find(notes,max_missing)
+
+__spelling_cache = _LRUCache(1024)
+__spelling_state = None
+
+def mode_cache_info():
+    """Returns hit/miss counters and the size of the cache of Mode spellings."""
+    return __spelling_cache.info()
+
+def set_mode_cache_size(maxsize):
+    """Replace the cache of Mode spellings with an empty one that keeps at most 'maxsize' spellings."""
+    global __spelling_cache
+    __spelling_cache = _LRUCache(maxsize)
+
+def _cached_spelling(mode):
+    """
+    | Returns the note names of a Mode's spelling after the root, cached per (root spelling, mode name).
+    | The cache starts over whenever MODES or MODE_LETTER_SPELLINGS change.
+    """
+    global __spelling_state
+    if not isinstance(MODES,_ObservedDict) or not isinstance(MODE_LETTER_SPELLINGS,_ObservedDict):
+        #The dictionaries were replaced with plain ones, whose changes cannot be seen
+        return tuple(note.note_name for note in mode._spell()[1:])
+    state = (id(MODES),MODES.version,id(MODE_LETTER_SPELLINGS),MODE_LETTER_SPELLINGS.version)
+    if state != __spelling_state:
+        __spelling_cache.clear()
+        __spelling_state = state
+    key = (mode.root.note_name,mode.mode)
+    names = __spelling_cache.get(key)
+    if names is None:
+        names = tuple(note.note_name for note in mode._spell()[1:])
+        __spelling_cache.put(key,names)
+    return names
 
 class Mode(_Meta):
 
@@ -785,6 +2692,8 @@ class Mode(_Meta):
     | Use a tuple of integers that describes how many alphabetical letters increase for each scale degree.
     """
 
+    __slots__ = ("root", "mode")
+
     def __init__(self,root,mode):
         
         if type(root) is Note:
@@ -798,8 +2707,6 @@ class Mode(_Meta):
             raise KeyError("Mode not found.  View the MODES dictionary to see/add modes.")
 
         self.mode = mode
-
-        self._lock()
     
     @property
     def name(self):
@@ -808,105 +2715,59 @@ class Mode(_Meta):
     
     @property
     def spelling(self):
-        """A tuple of Note objects that spell the Mode"""
+        """
+        | A tuple of Note objects that spell the Mode
+        | Spellings are cached, see mode_cache_info().
+        """
+        return (self.root,) + tuple(Note._make(name) for name in _cached_spelling(self))
+
+    @property
+    def mask(self):
+        """
+        | The 12-bit pitch-class mask of the Mode (bit n set when pitch class n is in it).
+        | It is the compiled mask of the mode (see MODE_REGISTRY) rotated to the root, so it never spells the Mode.
+        """
+        return _rotate_mask(_compiled_mode(self.mode).mask,self.root.pitch)
+
+    @property
+    def pitch_class_set(self):
+        """The Mode's pitch classes as a PitchClassSet."""
+        return PitchClassSet._from_mask(self.mask)
+
+    def _spell(self):
+        """Spells the Mode from its compiled tables (see MODE_REGISTRY), without using the spelling cache."""
+        compiled = _compiled_mode(self.mode)
+        root_pitch = self.root.pitch
+        root_letter = self.root.letter
         spelling = [self.root]
 
-        if type(MODES[self.mode]) is str:
-            parent_name = MODES[self.mode][:len(MODES[self.mode])-1]
-            offset = int(MODES[self.mode][-1]) - 1
-        elif type(MODES[self.mode]) is tuple:
-            parent_name = self.mode
-            offset = 0
-        else:
-            raise ValueError("Invalid Mode pattern. (Check MODES dictionary)")
-        parent = MODES[parent_name]
-        for item in parent:
-            if type(item) is not int:
-                raise ValueError("Invalid Mode pattern. (Check MODES dictionary)")
-        
-        next_pitch = self.root.pitch
-        next_letter = self.root.letter
-        index = offset
-        n = 1
+        if compiled.letters is not None:
+            for semitone, letter in zip(compiled.semitones[1:],compiled.letters[1:]):
+                spelling.append(Note.from_values((root_letter + letter) % 7,(root_pitch + semitone) % 12))
+            return tuple(spelling)
+
+        #Without a letter spelling, every degree moves up one letter and is respelled to keep to sharps or flats
         flats = False if "b" not in self.root.note_name else True
         sharps = False if "#" not in self.root.note_name else True
-        if parent_name in MODE_LETTER_SPELLINGS:
-            for step in parent:
-                if index == len(parent):
-                    index -= len(parent)
-                if n == len(parent):
-                    break
-                next_pitch += parent[index]
-                if parent_name in MODE_LETTER_SPELLINGS:
-                    next_letter += MODE_LETTER_SPELLINGS[parent_name][index]
-                else:
-                    next_letter += 1
-                if next_pitch < 0:
-                    next_pitch += 12
-                elif next_pitch > 11:
-                    next_pitch -= 12
-                if next_letter < 0:
-                    next_letter += 7
-                elif next_letter > 6:
-                    next_letter -= 7
-                if parent_name in MODE_LETTER_SPELLINGS:
-                    next_note = Note.from_values(next_letter,next_pitch)
-                else:
-                    next_note = Note.from_values(next_letter,next_pitch)
-                    if len(next_note.note_name) > 2:
-                        next_note = next_note.enharmonic()
-                    if next_note.note_name in ("B#","Cb","E#","Fb"):
-                        next_note = next_note.enharmonic()
-                    if "#" in next_note.note_name:
-                        if flats:
-                            next_note = next_note.enharmonic()
-                        if not flats and not sharps:
-                            sharps = True
-                    if "b" in next_note.note_name:
-                        if sharps:
-                            next_note = next_note.enharmonic()
-                        if not flats and not sharps:
-                            flats = True
-                spelling.append(next_note)
-                index += 1
-                n += 1
-        else:
-            flats = False if "b" not in self.root.note_name else True
-            sharps = False if "#" not in self.root.note_name else True
-            for step in parent:
-                if index == len(parent):
-                    index -= len(parent)
-                if n == len(parent):
-                    break
-                next_pitch += parent[index]
-                next_letter += 1
-                if next_pitch < 0:
-                    next_pitch += 12
-                elif next_pitch > 11:
-                    next_pitch -= 12
-                if next_letter < 0:
-                    next_letter += 7
-                elif next_letter > 6:
-                    next_letter -= 7
-                next_note = Note.from_values(next_letter,next_pitch)
-                if len(next_note.note_name) > 2:
+        degree = 1
+        for semitone in compiled.semitones[1:]:
+            next_note = Note.from_values((root_letter + degree) % 7,(root_pitch + semitone) % 12)
+            if len(next_note.note_name) > 2:
+                next_note = next_note.enharmonic()
+            if next_note.note_name in ("B#","Cb","E#","Fb"):
+                next_note = next_note.enharmonic()
+            if "#" in next_note.note_name:
+                if flats:
                     next_note = next_note.enharmonic()
-                if next_note.note_name in ("B#","Cb","E#","Fb"):
+                if not flats and not sharps:
+                    sharps = True
+            if "b" in next_note.note_name:
+                if sharps:
                     next_note = next_note.enharmonic()
-                if "#" in next_note.note_name:
-                    if flats:
-                        next_note = next_note.enharmonic()
-                    if not flats and not sharps:
-                        sharps = True
-                if "b" in next_note.note_name:
-                    if sharps:
-                        next_note = next_note.enharmonic()
-                    if not flats and not sharps:
-                        flats = True
-                index += 1
-                n += 1
-                spelling.append(next_note)
-                
+                if not flats and not sharps:
+                    flats = True
+            spelling.append(next_note)
+            degree += 1
         return tuple(spelling)
 
     #A Mode is iterable based on the spelling of it's Note objects
@@ -915,11 +2776,7 @@ class Mode(_Meta):
         
     #end of Mode class
 
-Amajor = Mode("A","major")
-for note in Amajor:
-    print(note.note_name)
-
-EXTENSIONS = {
+EXTENSIONS = _ObservedDict({
     "b9": ("min","2nd"),
     "addb9": ("min","2nd"),
     "2": ("maj","2nd"),
@@ -938,13 +2795,173 @@ EXTENSIONS = {
     "dim7": ("dim","7th"),
     "7": ("min","7th"),
     "maj7": ("maj","7th"),
-}
+})
 
 QUALITIES = (
     "maj","min","aug",
     "dim","sus","5",
 )
 
+def _compile_chord_template(quality,extensions):
+    """Works out the chord tones of a quality and set of extensions, as a tuple of (name, Interval) pairs."""
+    dictionary = {}
+
+    if quality == "maj":
+        third = Interval._make("maj","3rd")
+        fifth = Interval._make("per","5th")
+    elif quality == "min":
+        third = Interval._make("min","3rd")
+        fifth = Interval._make("per","5th")
+    elif quality == "aug":
+        third = Interval._make("maj","3rd")
+        fifth = Interval._make("aug","5th")
+    elif quality == "dim":
+        third = Interval._make("min","3rd")
+        fifth = Interval._make("dim","5th")
+    elif quality == "sus":
+        third = Interval._make("per","4th")
+        fifth = Interval._make("per","5th")
+    else:
+        third = None
+        fifth = Interval._make("per","5th")
+    if third:
+        dictionary["third"] = third
+    dictionary["fifth"] = fifth
+
+    need7 = False
+    need9 = False
+    for ext13 in ("13","b13"):
+        if ext13 in extensions:
+            dictionary["13th"] = Interval._make(*EXTENSIONS[ext13])
+            need7 = True
+            need9 = True
+            break
+    for ext9 in ("9","#9","b9"):
+        if ext9 in extensions:
+            dictionary["9th"] = Interval._make(*EXTENSIONS[ext9])
+            need7 = True
+            need9 = False
+            break
+    else:
+        if need9:
+            dictionary["9th"] = Interval._make("maj","2nd")
+
+    for ext7 in ("7","maj7","dim7"):
+        if ext7 in extensions:
+            dictionary["7th"] = Interval._make(*EXTENSIONS[ext7])
+            need7 = False
+            break
+    else:
+        if need7:
+            if quality == "dim":
+                dictionary["7th"] = Interval._make("maj","6th")
+            else:
+                dictionary["7th"] = Interval._make("min","7th")
+    for ext2 in ("2","addb9","add9"):
+        if ext2 in extensions:
+            dictionary["2nd"] = Interval._make(*EXTENSIONS[ext2])
+            break
+
+    for ext5 in ("b5","#5"):
+        if ext5 in extensions:
+            dictionary["fifth"] = Interval._make(*EXTENSIONS[ext5])
+
+    for ext in ("addb9","add9","2","add4","#11","b6","6"):
+        if ext in extensions:
+            dictionary[ext] = Interval._make(*EXTENSIONS[ext])
+
+    return tuple(dictionary.items())
+
+def _drop_repeated_pitches(notes):
+    """
+    | Removes notes that repeat the pitch of the note before them from a list sorted from the root, in one pass.
+    | Chord has always done this by removing notes from the list while looping over it, which skips the note
+    | after each one removed; that behaviour is kept so that Chord.notes stays the same.
+    """
+    kept = [notes[0]]
+    previous_note = notes[0]
+    index = 1
+    while index < len(notes):
+        note = notes[index]
+        if previous_note.pitch == note.pitch:
+            previous_note = note
+            index += 1
+            if index < len(notes):
+                kept.append(notes[index])
+        else:
+            kept.append(note)
+            previous_note = note
+        index += 1
+    return kept
+
+__chord_templates = _LRUCache(1024)
+__chord_cache = _LRUCache(4096)
+__chord_state = None
+
+def chord_cache_info():
+    """Returns hit/miss counters and sizes of the caches of chord templates, chord tones per root, and parsed chord symbols."""
+    return {
+        "templates": __chord_templates.info(),
+        "chords": __chord_cache.info(),
+        "symbols": __symbol_cache.info(),
+    }
+
+def set_chord_cache_size(maxsize):
+    """Replace the cache of chord tones per root with an empty one that keeps at most 'maxsize' chords."""
+    global __chord_cache
+    __chord_cache = _LRUCache(maxsize)
+
+def _chord_tones(root,quality,extensions):
+    """
+    | Returns the template of a chord (see _compile_chord_template), the names and octave changes
+    | of its notes after the root, and its pitch-class mask, cached per (root spelling, quality, set of extensions).
+    | Both caches start over whenever EXTENSIONS changes.
+    """
+    global __chord_state
+    octave_valued = bool(root.octave)
+    if not isinstance(EXTENSIONS,_ObservedDict):
+        #EXTENSIONS was replaced with a plain dict, whose changes cannot be seen
+        return _compile_chord_tones(root.note_name,octave_valued,quality,extensions)
+    state = (id(EXTENSIONS),EXTENSIONS.version)
+    if state != __chord_state:
+        __chord_templates.clear()
+        __chord_cache.clear()
+        __chord_state = state
+    key = (root.note_name,octave_valued,quality,extensions)
+    tones = __chord_cache.get(key)
+    if tones is None:
+        template = __chord_templates.get((quality,extensions))
+        if template is None:
+            template = _compile_chord_template(quality,extensions)
+            __chord_templates.put((quality,extensions),template)
+        tones = (template,) + _spell_chord(root.note_name,octave_valued,template)
+        __chord_cache.put(key,tones)
+    return tones
+
+def _compile_chord_tones(name,octave_valued,quality,extensions):
+    template = _compile_chord_template(quality,extensions)
+    return (template,) + _spell_chord(name,octave_valued,template)
+
+def _spell_chord(name,octave_valued,template):
+    """
+    | Adds each interval of a template to a root, then sorts and drops repeated pitches the way Chord always has.
+    | Returns the names and octave changes of the notes after the root, and the pitch-class mask of the chord.
+    """
+    root = Note._from_fields(name,4 if octave_valued else None)
+    notes = [root]
+    for (tone,interval) in template:
+        notes.append(root + interval)
+    notes.sort(key=root.sort_from_root)
+    notes = _drop_repeated_pitches(notes)
+    names = tuple(
+        (note.note_name, None if note.octave is None else note.octave - 4)
+        for note in notes[1:]
+    )
+    mask = 0
+    for note in notes:
+        mask |= 1 << note.pitch
+    return names, mask
+
 class Chord(_Meta):
 
     """
@@ -955,6 +2972,8 @@ class Chord(_Meta):
     | Uncommon, strange, repetitious, or ridiculous combinations of extensions might not work as expected.
     """
 
+    __slots__ = ("_root", "_quality", "_extensions", "_dictionary", "_notes", "_mask")
+
     def __init__(self,root,quality,*extensions):
 
         try:
@@ -970,93 +2989,21 @@ class Chord(_Meta):
         self._root = root
         self._quality = quality
         self._extensions = extensions
+        template, names, mask = _chord_tones(root,quality,frozenset(extensions))
+        dictionary = dict(template)
+        octave = root.octave
+        rhythm = root._Note__rhythm if root.rhythm else 0
         notes = [root]
-        dictionary = {}
-
-        if self.quality == "maj":
-            third = Interval("maj","3rd")
-            fifth = Interval("per","5th")
-        elif self.quality == "min":
-            third = Interval("min","3rd")
-            fifth = Interval("per","5th")
-        elif self.quality == "aug":
-            third = Interval("maj","3rd")
-            fifth = Interval("aug","5th")
-        elif self.quality == "dim":
-            third = Interval("min","3rd")
-            fifth = Interval("dim","5th")
-        elif self.quality == "sus":
-            third = Interval("per","4th")
-            fifth = Interval("per","5th")
-        else:
-            third = None
-            fifth = Interval("per","5th")
-        if third:
-            dictionary["third"] = third
-        dictionary["fifth"] = fifth
-
-        need7 = False
-        need9 = False
-        for ext13 in ("13","b13"):
-            if ext13 in extensions:
-                dictionary["13th"] = Interval(*EXTENSIONS[ext13])
-                need7 = True
-                need9 = True
-                break
-        for ext9 in ("9","#9","b9"):
-            if ext9 in extensions:
-                dictionary["9th"] = Interval(*EXTENSIONS[ext9])
-                need7 = True
-                need9 = False
-                break
-        else:
-            if need9:
-                dictionary["9th"] = Interval("maj","2nd")
-
-        for ext7 in ("7","maj7","dim7"):
-            if ext7 in extensions:
-                dictionary["7th"] = Interval(*EXTENSIONS[ext7])
-                need7 = False
-                break
-        else:
-            if need7:
-                if quality == "dim":
-                    dictionary["7th"] = Interval("maj","6th")
-                else:
-                    dictionary["7th"] = Interval("min","7th")
-        for ext2 in ("2","addb9","add9"):
-            if ext2 in extensions:
-                dictionary["2nd"] = Interval(*EXTENSIONS[ext2])
-                break
-        
-        for ext5 in ("b5","#5"):
-            if ext5 in extensions:
-                dictionary["fifth"] = Interval(*EXTENSIONS[ext5])
-
-        for ext in ("addb9","add9","2","add4","#11","b6","6"):
-            if ext in extensions:
-                dictionary[ext] = Interval(*EXTENSIONS[ext])
-        
+        for (name,octave_change) in names:
+            notes.append(Note._make(
+                name,
+                None if octave_change is None else octave + octave_change,
+                rhythm,root.dots,root.triplet,
+            ))
 
-        for intvl in dictionary:
-            note = root + dictionary[intvl]
-            notes.append(note)
-        
-
-        notes.sort(key=root.sort_from_root)
-        previous_note = root
-        first = True
-        for note in notes:
-            if first:
-                first = False
-                continue
-            if previous_note.pitch == note.pitch:
-                notes.remove(note)
-            previous_note = note
-        
         self._dictionary = dictionary
         self._notes = tuple(notes)
-        self._lock()
+        self._mask = mask
     
     @property
     def root(self):
@@ -1083,4 +3030,829 @@ class Chord(_Meta):
         """A tuple containing all the Note objects of the Chord."""
         return self._notes
 
-    
\ No newline at end of file
+    @property
+    def mask(self):
+        """The 12-bit pitch-class mask of the Chord's notes (bit n set when pitch class n is in it)."""
+        return self._mask
+
+    @property
+    def pitch_class_set(self):
+        """The Chord's pitch classes as a PitchClassSet."""
+        return PitchClassSet._from_mask(self._mask)
+
+    @staticmethod
+    def from_symbol(symbol,octave=None):
+        """
+        | Create a Chord from a chord symbol like 'Ebmaj7#11', 'F#m7b5' or 'Bb13', rooted at 'octave' (None for no octave).
+        | See parse_chord_symbol.  For many symbols, parse_chord_symbols is faster.
+        """
+        if octave is not None and type(octave) is not int:
+            raise ValueError('Octave value must be an integer or None.')
+        root, quality, extensions = parse_chord_symbol(symbol)
+        return Chord(Note._make(root,octave),quality,*extensions)
+
+#Chord symbol tokens, each with the quality it sets (None if it sets none) and the extensions it adds
+_CHORD_SYMBOL_TOKENS = {
+    "M": ("maj",()),
+    "maj": ("maj",()),
+    "Maj": ("maj",()),
+    "m": ("min",()),
+    "mi": ("min",()),
+    "min": ("min",()),
+    "-": ("min",()),
+    "aug": ("aug",()),
+    "+": ("aug",()),
+    "dim": ("dim",()),
+    "o": ("dim",()),
+    "\u00b0": ("dim",()),
+    "dim7": ("dim",("dim7",)),
+    "o7": ("dim",("dim7",)),
+    "\u00b07": ("dim",("dim7",)),
+    "\u00f8": ("dim",("7",)),
+    "\u00f87": ("dim",("7",)),
+    "sus": ("sus",()),
+    "sus4": ("sus",()),
+    "sus2": ("5",("2",)),
+    "5": ("5",()),
+    "2": (None,("2",)),
+    "6": (None,("6",)),
+    "7": (None,("7",)),
+    "9": (None,("9",)),
+    "11": (None,("7","9","add4")),
+    "13": (None,("13",)),
+    "69": (None,("6","add9")),
+    "6/9": (None,("6","add9")),
+    "M7": (None,("maj7",)),
+    "M9": (None,("maj7","9")),
+    "maj7": (None,("maj7",)),
+    "maj9": (None,("maj7","9")),
+    "maj11": (None,("maj7","9","add4")),
+    "maj13": (None,("maj7","13")),
+    "Maj7": (None,("maj7",)),
+    "Maj9": (None,("maj7","9")),
+    "\u0394": (None,("maj7",)),
+    "\u03947": (None,("maj7",)),
+    "\u03949": (None,("maj7","9")),
+    "b5": (None,("b5",)),
+    "#5": (None,("#5",)),
+    "b6": (None,("b6",)),
+    "b9": (None,("b9",)),
+    "#9": (None,("#9",)),
+    "#11": (None,("#11",)),
+    "b13": (None,("b13",)),
+    "add2": (None,("2",)),
+    "add9": (None,("add9",)),
+    "addb9": (None,("addb9",)),
+    "add4": (None,("add4",)),
+    "add11": (None,("add4",)),
+    "add13": (None,("6",)),
+}
+
+_CHORD_SYMBOL_SEPARATORS = frozenset("(), ")
+_CHORD_SYMBOL_ACCIDENTALS = str.maketrans({"\u266f": "#", "\u266d": "b"})
+
+#Tokens grouped by their first character, longest first, for longest-match scanning
+_CHORD_SYMBOL_INDEX = {}
+for _token in sorted(_CHORD_SYMBOL_TOKENS, key=len, reverse=True):
+    if _token:
+        _CHORD_SYMBOL_INDEX.setdefault(_token[0],[]).append(_token)
+del _token
+
+def _parse_chord_symbol(symbol):
+    """Does the work of parse_chord_symbol, without the cache."""
+    if type(symbol) is not str:
+        raise ValueError("Chord symbol must be a string.")
+    text = symbol.strip().translate(_CHORD_SYMBOL_ACCIDENTALS)
+    if not text or text[0] not in "ABCDEFG":
+        raise ValueError("Invalid chord symbol '" + symbol + "': it must start with a note name.")
+    end = 1
+    while end < len(text) and text[end] in "#b":
+        end += 1
+    root = text[:end]
+
+    quality = None
+    extensions = []
+    position = end
+    while position < len(text):
+        character = text[position]
+        if character in _CHORD_SYMBOL_SEPARATORS:
+            position += 1
+            continue
+        for token in _CHORD_SYMBOL_INDEX.get(character,()):
+            if text.startswith(token,position):
+                break
+        else:
+            if character == "/":
+                raise ValueError("Invalid chord symbol '" + symbol + "': slash chords are not supported.")
+            raise ValueError("Invalid chord symbol '" + symbol + "': unknown '" + text[position:] + "'.")
+        token_quality, token_extensions = _CHORD_SYMBOL_TOKENS[token]
+        if token_quality is not None:
+            if quality is not None:
+                raise ValueError("Invalid chord symbol '" + symbol + "': more than one quality.")
+            quality = token_quality
+        for extension in token_extensions:
+            if extension not in extensions:
+                extensions.append(extension)
+        position += len(token)
+
+    if quality is None:
+        quality = "maj"
+    return (root,quality,tuple(extensions))
+
+__symbol_cache = _LRUCache(4096)
+
+def parse_chord_symbol(symbol):
+    """
+    | Reads a chord symbol like 'Ebmaj7#11', 'F#m7b5' or 'Bb13' and returns (root name, quality, extensions),
+    | which are the arguments Chord takes.  Results are cached per symbol.
+    | Raises a ValueError for symbols it does not understand, and for slash chords.
+    """
+    #Checked before the cache, which cannot take unhashable keys
+    if type(symbol) is not str:
+        raise ValueError("Chord symbol must be a string.")
+    parsed = __symbol_cache.get(symbol)
+    if parsed is None:
+        parsed = _parse_chord_symbol(symbol)
+        __symbol_cache.put(symbol,parsed)
+    return parsed
+
+def parse_chord_symbols(symbols,octave=None):
+    """
+    | Yields a Chord for each chord symbol in the iterable 'symbols', rooted at 'octave' (None for no octave).
+    | Equivalent to calling Chord.from_symbol on each symbol, but faster on long inputs.
+    """
+    if octave is not None and type(octave) is not int:
+        raise ValueError('Octave value must be an integer or None.')
+    cache = __symbol_cache
+    make_note = Note._make
+    for symbol in symbols:
+        if type(symbol) is not str:
+            raise ValueError("Chord symbol must be a string.")
+        parsed = cache.get(symbol)
+        if parsed is None:
+            parsed = _parse_chord_symbol(symbol)
+            cache.put(symbol,parsed)
+        root, quality, extensions = parsed
+        yield Chord(make_note(root,octave),quality,*extensions)
+
+
+#Extension combinations ChordIndex tries with every quality, from simplest to most complex
+CHORD_INDEX_EXTENSIONS = (
+    (),
+    ("7",),("maj7",),("dim7",),("6",),
+    ("2",),("add9",),("add4",),("b5",),("#5",),
+    ("9",),("maj7","9"),("6","add9"),("7","b5"),("7","#5"),("maj7","#5"),
+    ("7","b9"),("7","#9"),("7","#11"),("maj7","#11"),("7","b13"),
+    ("13",),("maj7","13"),("9","#11"),("7","9","add4"),("7","b9","b13"),("7","#9","b13"),
+)
+
+#How much each quality counts against a chord's simplicity
+_CHORD_INDEX_QUALITY_COST = {"maj": 0, "min": 0, "dim": 1, "sus": 1, "aug": 1, "5": 2}
+
+class ChordIndex:
+
+    """
+    | Names chords from their pitch classes.
+    |
+    | Every quality in QUALITIES is combined with every entry of 'extensions' (CHORD_INDEX_EXTENSIONS by default)
+    | on all 12 roots, and the resulting pitch-class masks are indexed up front, so a lookup is one dictionary access.
+    | Chords with a perfect fifth, triads included, are indexed a second time without it, for voicings that leave the
+    | fifth out, so a bare third such as C-E still reads as C major.
+    |
+    | Candidates are ranked by simplicity: the number of extensions, plus one for 'dim', 'sus' and 'aug' (two for '5'),
+    | plus two for a missing fifth.  Complete voicings win ties.  The 'dim7' extension is only tried on 'dim' chords.
+    | Use identify_chord rather than making an index yourself.
+    """
+
+    def __init__(self,extensions=CHORD_INDEX_EXTENSIONS):
+        candidates = {}
+        for (order,combination) in enumerate(extensions):
+            for quality in QUALITIES:
+                if "dim7" in combination and quality != "dim":
+                    continue
+                try:
+                    chord = Chord(Note._make("C"),quality,*combination)
+                except ValueError:
+                    continue
+                cost = len(combination) + _CHORD_INDEX_QUALITY_COST[quality]
+                ChordIndex.__add(candidates,chord.mask,(cost,False,order,quality,combination))
+                fifth = chord.dictionary["fifth"]
+                #Triads too, but not a power chord, which would leave a single note
+                if fifth.quality == "per" and bin(chord.mask).count("1") > 2:
+                    ChordIndex.__add(candidates,chord.mask & ~(1 << 7),(cost + 2,True,order,quality,combination))
+
+        index = {}
+        for (mask,entry) in candidates.items():
+            for root in range(12):
+                index.setdefault(_rotate_mask(mask,root),[]).append(entry[:1] + (root,) + entry[1:])
+        self.__index = {
+            mask: tuple((root,quality,combination) for (cost,root,missing,order,quality,combination) in sorted(entries,key=ChordIndex.__rank))
+            for (mask,entries) in index.items()
+        }
+
+    @staticmethod
+    def __add(candidates,mask,entry):
+        #Of the chords with the same notes on the same root, keep the simplest
+        if mask not in candidates or entry < candidates[mask]:
+            candidates[mask] = entry
+
+    @staticmethod
+    def __rank(entry):
+        (cost,root,missing,order,quality,combination) = entry
+        return (cost,missing,order,QUALITIES.index(quality),root)
+
+    def __len__(self):
+        return len(self.__index)
+
+    def lookup(self,mask,bass=None):
+        """
+        | Returns a tuple of (root pitch class, quality, extensions) for each chord whose notes are exactly the 12-bit 'mask', simplest first.
+        | If a 'bass' pitch class is given, chords on that root come first.
+        """
+        candidates = self.__index.get(mask,())
+        if bass is None or not candidates:
+            return candidates
+        return (
+            tuple(candidate for candidate in candidates if candidate[0] == bass)
+            + tuple(candidate for candidate in candidates if candidate[0] != bass)
+        )
+
+    def identify(self,notes,bass=None):
+        """
+        | Returns a list of (root name, quality, extensions) for each chord made of the pitch classes of 'notes', simplest first.
+        | 'notes' can be Note objects (rests are ignored), a PitchClassSet, or a 12-bit mask integer.
+        | 'bass' is an optional Note or pitch class; chords on the bass come first, and it is added to the notes.
+        | Roots are spelled the way the given notes spell them.  The result can be passed on as Chord(Note(root), quality, *extensions).
+        """
+        names = {}
+        if type(notes) is int or type(notes) is PitchClassSet:
+            mask = PitchClassSet(notes).mask if type(notes) is int else notes.mask
+        else:
+            mask = 0
+            for note in notes:
+                if type(note) is not Note:
+                    raise ValueError("Chords can only be identified from Note objects, a PitchClassSet, or a mask.")
+                if note.is_rest:
+                    continue
+                mask |= 1 << note.pitch
+                names.setdefault(note.pitch,note.note_name)
+
+        if bass is not None:
+            if type(bass) is Note:
+                if bass.is_rest:
+                    raise ValueError("The bass of a chord cannot be a rest.")
+                names.setdefault(bass.pitch,bass.note_name)
+                bass = bass.pitch
+            elif type(bass) is not int or bass not in range(12):
+                raise ValueError("Bass must be a Note object or a pitch class between 0 and 11.")
+            mask |= 1 << bass
+
+        return [
+            (names.get(root,_PITCH_CLASS_NAMES[root]),quality,combination)
+            for (root,quality,combination) in self.lookup(mask,bass)
+        ]
+
+__chord_index = None
+__chord_index_state = None
+
+def identify_chord(notes,bass=None):
+    """
+    | Names the chord made of 'notes' (Note objects, a PitchClassSet, or a mask) with an optional 'bass' Note or pitch class.
+    | Returns a ranked list of (root name, quality, extensions).  See ChordIndex.identify.
+    | The index is built on first use and again whenever EXTENSIONS changes.
+    """
+    global __chord_index, __chord_index_state
+    state = (id(EXTENSIONS),getattr(EXTENSIONS,"version",None))
+    if __chord_index is None or state != __chord_index_state or not isinstance(EXTENSIONS,_ObservedDict):
+        __chord_index = ChordIndex()
+        __chord_index_state = state
+    return __chord_index.identify(notes,bass)
+
+class NoteEvent(_Meta):
+
+    """
+    | A note heard in a stream of frequency readings, as yielded by PitchTracker.
+    | 'note' is an octave-valued Note; 'onset' and 'duration' are in the units of the stream's timestamps (usually seconds).
+    """
+
+    class_name = "NoteEvent"
+
+    __slots__ = ("__note", "__onset", "__duration")
+
+    def __init__(self,note,onset,duration):
+        if type(note) is not Note or note.octave is None:
+            raise ValueError("A NoteEvent needs an octave-valued Note object.")
+        if duration < 0:
+            raise ValueError("The duration of a NoteEvent cannot be negative.")
+        self.__note = note
+        self.__onset = onset
+        self.__duration = duration
+
+    @property
+    def note(self):
+        """The Note heard."""
+        return self.__note
+
+    @property
+    def onset(self):
+        """The timestamp of the first reading of the note."""
+        return self.__onset
+
+    @property
+    def duration(self):
+        """How long the note lasted."""
+        return self.__duration
+
+    @property
+    def end(self):
+        """The timestamp at which the note stopped: onset + duration."""
+        return self.__onset + self.__duration
+
+    def __repr__(self):
+        return f"NoteEvent({self.__note.note_name}{self.__note.octave}, onset={self.__onset!r}, duration={self.__duration!r})"
+
+class PitchTracker:
+
+    """
+    | Turns a stream of frequency readings into stable NoteEvents.
+    |
+    | Each reading is (timestamp, Hz, confidence).  A reading below 'min_confidence', or whose frequency is not a
+    | positive number, counts as silence.  Readings are smoothed in equal-tempered semitones from get_A4(),
+    | and the smoothed pitch is matched to the nearest note of the tuning in effect (see tuning()),
+    | spelled as Note.from_frequency spells it.
+    |
+    | 'median' is the number of readings in the sliding median that smooths out jitter (1 turns smoothing off).
+    |     The smoothed reading is silence when more than half of the window is silence.
+    | 'hysteresis' is how far, in cents, the smoothed pitch must go past the half-semitone boundary before it
+    |     counts as another note, so a pitch wavering between two notes does not flicker between them.
+    |     In tunings whose neighbouring notes are closer than a half step, it shrinks in proportion.
+    | 'min_duration' is how long another note (or a silence) must last before it replaces the current one.
+    |     Shorter blips are absorbed into the note around them, so no NoteEvent is shorter than this.
+    |
+    | Feed readings with push (one at a time) or push_chunk (a NumPy array of shape (n, 3)); both return the list
+    | of NoteEvents completed by that input.  flush ends the current note at the last reading.
+    | track(stream) does all of this as a generator.  Only the median window and the current note are kept,
+    | so memory stays constant however long the stream runs.
+    """
+
+    def __init__(self,median=5,hysteresis=30,min_duration=0.05,min_confidence=0.5,prefer_flat=False):
+        if type(median) is not int or median < 1:
+            raise ValueError("The median window must be a positive integer.")
+        if type(hysteresis) not in (int,float) or not 0 <= hysteresis < 50:
+            raise ValueError("Hysteresis must be a number of cents from 0 up to (not including) 50.")
+        if type(min_duration) not in (int,float) or min_duration < 0:
+            raise ValueError("The minimum duration must be a positive number or 0.")
+        if type(min_confidence) not in (int,float):
+            raise ValueError("The minimum confidence must be a number.")
+        if type(prefer_flat) is not bool:
+            raise ValueError("prefer_flat must be Boolean.")
+        self.__median = median
+        self.__hysteresis = hysteresis / 100
+        self.__margin = 0.5 + hysteresis / 100
+        self.__min_duration = min_duration
+        self.__min_confidence = min_confidence
+        self.__prefer_flat = prefer_flat
+        self.reset()
+
+    def reset(self):
+        """Forgets the readings so far, without yielding the current note."""
+        #Positions in semitones (None for silence) of the last readings
+        self.__window = deque(maxlen=self.__median)
+        #The current note (None for silence), its position in semitones, and the timestamp it started.
+        #In equal temperament a note is its hard pitch, which is also its position; otherwise a (name, octave) pair.
+        self.__pitch = None
+        self.__pitch_position = None
+        self.__onset = None
+        #The note the readings have moved to, not yet heard for min_duration
+        self.__changing = False
+        self.__candidate = None
+        self.__candidate_position = None
+        self.__candidate_onset = None
+        self.__last = None
+
+    def __position(self,Hz,confidence):
+        #NaN and infinite confidences count as silence, the same as in push_chunk
+        if not isfinite(confidence) or confidence < self.__min_confidence or not Hz > 0 or Hz == float("inf"):
+            return None
+        return 12 * (log2(Hz) - log2(get_A4())) + 57
+
+    def __smoothed(self):
+        window = self.__window
+        voiced = sorted(position for position in window if position is not None)
+        count = len(voiced)
+        if 2 * count < len(window):
+            return None
+        middle = count // 2
+        if count % 2:
+            return voiced[middle]
+        return (voiced[middle - 1] + voiced[middle]) / 2
+
+    def __snap(self,position,tuning):
+        """Returns the note of 'tuning' nearest to a position in semitones, and the note's own position."""
+        (note,cents) = tuning.nearest(get_A4() * 2 ** ((position - 57) / 12),self.__prefer_flat)
+        return (note.note_name,note.octave), position - cents / 100
+
+    def __holds(self,pitch,pitch_position,position,tuning):
+        """
+        | True if a position is still heard as 'pitch': it must reach the next note's share of the way past
+        | the boundary between them, with the hysteresis scaled to the distance to that note (at most a half step).
+        """
+        (nearest,nearest_position) = self.__snap(position,tuning)
+        if nearest == pitch:
+            return True
+        shift = self.__hysteresis * min(abs(nearest_position - pitch_position),1)
+        return self.__snap(position - shift if position > pitch_position else position + shift,tuning)[0] == pitch
+
+    def __step(self,timestamp,position,events):
+        if self.__onset is None:
+            self.__onset = timestamp
+        self.__last = timestamp
+        pitch = self.__pitch
+        tuning = get_tuning()
+        if position is None:
+            (heard,heard_position) = (None,None)
+        elif tuning is EQUAL_TEMPERAMENT:
+            if pitch is not None and abs(position - pitch) <= self.__margin:
+                heard = pitch
+            elif self.__changing and self.__candidate is not None and abs(position - self.__candidate) <= self.__margin:
+                heard = self.__candidate
+            else:
+                heard = int(position + 0.5 if position >= 0 else position - 0.5)
+            heard_position = heard
+        elif pitch is not None and self.__holds(pitch,self.__pitch_position,position,tuning):
+            (heard,heard_position) = (pitch,self.__pitch_position)
+        elif self.__changing and self.__candidate is not None and self.__holds(self.__candidate,self.__candidate_position,position,tuning):
+            (heard,heard_position) = (self.__candidate,self.__candidate_position)
+        else:
+            (heard,heard_position) = self.__snap(position,tuning)
+        if heard == pitch:
+            self.__changing = False
+            return
+        if not self.__changing or heard != self.__candidate:
+            self.__changing = True
+            self.__candidate = heard
+            self.__candidate_position = heard_position
+            self.__candidate_onset = timestamp
+        if timestamp - self.__candidate_onset >= self.__min_duration:
+            if pitch is not None:
+                events.append(self.__event(pitch,self.__onset,self.__candidate_onset))
+            self.__pitch = heard
+            self.__pitch_position = self.__candidate_position
+            self.__onset = self.__candidate_onset
+            self.__changing = False
+
+    def __event(self,pitch,onset,end):
+        if type(pitch) is tuple:
+            note = Note._make(*pitch)
+        else:
+            note = Note.from_hard_pitch(pitch,prefer_flat=self.__prefer_flat)
+        return NoteEvent(note,onset,end - onset)
+
+    def __check_time(self,timestamp):
+        if not isfinite(timestamp):
+            raise ValueError("Timestamps must be finite numbers.")
+        if self.__last is not None and timestamp < self.__last:
+            raise ValueError("Timestamps must not go backwards.")
+
+    def push(self,timestamp,Hz,confidence=1.0):
+        """
+        | Adds one reading, and returns a list of the NoteEvents it completed (usually empty).
+        | The values can be any real numbers, NumPy scalars included.
+        """
+        for value in (timestamp,Hz,confidence):
+            if not isinstance(value,Real):
+                raise ValueError("A reading must be made of numbers: (timestamp, Hz, confidence).")
+        #NumPy scalars are turned into floats, so timestamps and arithmetic stay plain Python
+        if type(timestamp) is not int and type(timestamp) is not float:
+            timestamp = float(timestamp)
+        if type(Hz) is not int and type(Hz) is not float:
+            Hz = float(Hz)
+        if type(confidence) is not int and type(confidence) is not float:
+            confidence = float(confidence)
+        self.__check_time(timestamp)
+        events = []
+        self.__window.append(self.__position(Hz,confidence))
+        self.__step(timestamp,self.__smoothed(),events)
+        return events
+
+    def push_chunk(self,readings):
+        """
+        | Adds an array of readings of shape (n, 3), one (timestamp, Hz, confidence) row each,
+        | and returns a list of the NoteEvents they completed.  Gives the same events as pushing each row in turn,
+        | but finds the frequencies and the sliding medians of the whole chunk at once.
+        """
+        readings = np.asarray(readings,dtype=np.float64)
+        if readings.ndim != 2 or readings.shape[1] != 3:
+            raise ValueError("A chunk of readings must have the shape (n, 3): (timestamp, Hz, confidence) rows.")
+        if not np.all(np.isfinite(readings[:,0])):
+            raise ValueError("Timestamps must be finite numbers.")
+        events = []
+        if not len(readings):
+            return events
+        self.__check_time(float(readings[0,0]))
+        if np.any(np.diff(readings[:,0]) < 0):
+            raise ValueError("Timestamps must not go backwards.")
+
+        #Until the median window has filled, each reading is pushed on its own
+        start = 0
+        while start < len(readings) and len(self.__window) < self.__median:
+            (timestamp,Hz,confidence) = readings[start].tolist()
+            events += self.push(timestamp,Hz,confidence)
+            start += 1
+        readings = readings[start:]
+        if not len(readings):
+            return events
+
+        Hz = readings[:,1]
+        voiced = np.isfinite(readings[:,2]) & (readings[:,2] >= self.__min_confidence) & (Hz > 0) & (Hz < np.inf)
+        with np.errstate(divide="ignore",invalid="ignore"):
+            positions = np.where(voiced,12 * (np.log2(Hz) - log2(get_A4())) + 57,np.nan)
+        history = np.array([np.nan if position is None else position for position in self.__window][1:],dtype=np.float64)
+        #Silence (NaN) sorts last, so the voiced readings of each window come first
+        windows = np.sort(np.lib.stride_tricks.sliding_window_view(np.concatenate((history,positions)),self.__median),axis=1)
+        counts = np.count_nonzero(~np.isnan(windows),axis=1)
+        rows = np.arange(len(windows))
+        low = windows[rows,np.maximum(counts - 1,0) // 2]
+        high = windows[rows,counts // 2]
+        smoothed = np.where(2 * counts < self.__median,np.nan,(low + high) / 2)
+
+        step = self.__step
+        for (timestamp,position) in zip(readings[:,0].tolist(),smoothed.tolist()):
+            step(timestamp,None if position != position else position,events)
+        self.__window.extend(None if position != position else position for position in positions[-self.__median:].tolist())
+        return events
+
+    def flush(self):
+        """Ends the current note at the last reading, returns it in a list (empty during a silence), and starts over."""
+        events = []
+        if self.__pitch is not None:
+            events.append(self.__event(self.__pitch,self.__onset,self.__last))
+        self.reset()
+        return events
+
+    def track(self,stream):
+        """
+        | Yields the NoteEvents of a stream of readings, as they complete, and the last one when the stream ends.
+        | Each item of 'stream' is a (timestamp, Hz, confidence) reading (a tuple, or a row of an array)
+        | or a NumPy chunk of shape (n, 3).  A whole array of shape (n, 3) can also be given as 'stream', as one chunk.
+        """
+        if getattr(stream,"ndim",None) == 2:
+            stream = (stream,)
+        for item in stream:
+            if getattr(item,"ndim",1) == 2:
+                yield from self.push_chunk(item)
+            else:
+                yield from self.push(*item)
+        yield from self.flush()
+
+def track_pitches(stream,median=5,hysteresis=30,min_duration=0.05,min_confidence=0.5,prefer_flat=False):
+    """
+    | Yields stable NoteEvents from a stream of (timestamp, Hz, confidence) readings or NumPy chunks of them.
+    | See PitchTracker for the options.
+    """
+    return PitchTracker(median,hysteresis,min_duration,min_confidence,prefer_flat).track(stream)
+
+#Classes whose public methods and properties are timed while instrumentation is on
+_INSTRUMENTED_CLASSES = (
+    Rhythm, Note, NoteArray, Interval, IntervalMatrix, PitchClassSet,
+    CompiledMode, ModeRegistry, ModeIndex, Mode, Chord, ChordIndex,
+    NoteEvent, PitchTracker,
+)
+
+#Methods that create an object without going through __init__, counted as constructions
+_INSTRUMENTED_CONSTRUCTORS = {Note: ("_from_fields",), PitchClassSet: ("_from_mask",)}
+
+#Operators timed along with the public methods
+_INSTRUMENTED_OPERATORS = ("__add__", "__sub__", "__getitem__")
+
+#inspect.CO_GENERATOR, without importing inspect
+_CO_GENERATOR = 0x20
+
+__instrumentation_depth = 0
+__installed = []
+__constructions = {}
+__calls = {}
+
+def _instrument(function,key,counts_as=None):
+    """Wraps a function so that each call adds to the counters of 'key' (and constructs one 'counts_as' object)."""
+    calls = __calls
+    constructions = __constructions
+    calls.setdefault(key,[0,0])
+    if counts_as is not None:
+        constructions.setdefault(counts_as,0)
+    code = getattr(function,"__code__",None)
+    if code is not None and code.co_flags & _CO_GENERATOR:
+        return _instrument_generator(function,key)
+    def instrumented(*args,**kwargs):
+        if counts_as is not None:
+            constructions[counts_as] += 1
+        start = perf_counter_ns()
+        try:
+            return function(*args,**kwargs)
+        finally:
+            record = calls[key]
+            record[0] += 1
+            record[1] += perf_counter_ns() - start
+    instrumented.__name__ = function.__name__
+    instrumented.__doc__ = function.__doc__
+    instrumented.__wrapped__ = function
+    return instrumented
+
+def _instrument_generator(function,key):
+    """
+    | Wraps a generator function so that each call adds one call to the counters of 'key',
+    | and the time spent producing each item (not the time the caller spends between items) adds to its time.
+    """
+    calls = __calls
+    def timed(generator):
+        while True:
+            start = perf_counter_ns()
+            try:
+                value = next(generator)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                calls[key][1] += perf_counter_ns() - start
+            yield value
+    def instrumented(*args,**kwargs):
+        calls[key][0] += 1
+        return timed(function(*args,**kwargs))
+    instrumented.__name__ = function.__name__
+    instrumented.__doc__ = function.__doc__
+    instrumented.__wrapped__ = function
+    return instrumented
+
+def _install_instrumentation():
+    for cls in _INSTRUMENTED_CLASSES:
+        name = cls.__name__
+        constructors = _INSTRUMENTED_CONSTRUCTORS.get(cls,())
+        for (attribute,value) in list(cls.__dict__.items()):
+            if attribute == "__init__" or attribute in constructors:
+                counts_as = name
+            elif attribute.startswith("_") and attribute not in _INSTRUMENTED_OPERATORS:
+                continue
+            else:
+                counts_as = None
+            key = name + "." + attribute
+            if type(value) is property:
+                wrapped = property(
+                    _instrument(value.fget,key) if value.fget else None,
+                    _instrument(value.fset,key + " (set)") if value.fset else None,
+                    value.fdel,
+                    value.__doc__,
+                )
+            elif type(value) is staticmethod:
+                wrapped = staticmethod(_instrument(value.__func__,key,counts_as))
+            elif type(value) is classmethod:
+                wrapped = classmethod(_instrument(value.__func__,key,counts_as))
+            elif callable(value) and type(value) is not type:
+                wrapped = _instrument(value,key,counts_as)
+            else:
+                continue
+            __installed.append((cls,attribute,value))
+            setattr(cls,attribute,wrapped)
+
+    namespace = globals()
+    for (name,value) in list(namespace.items()):
+        if (name.startswith("_") or "instrument" in name or type(value) is not type(_instrument)
+                or value.__module__ != __name__):
+            continue
+        __installed.append((None,name,value))
+        namespace[name] = _instrument(value,name)
+
+def _remove_instrumentation():
+    namespace = globals()
+    while __installed:
+        (cls,attribute,value) = __installed.pop()
+        if cls is None:
+            namespace[attribute] = value
+        else:
+            setattr(cls,attribute,value)
+
+def enable_instrumentation(reset=True):
+    """
+    | Start counting constructions per class, and calls and time spent per public method, property and function.
+    |
+    | Instrumentation works by wrapping the methods of the classes while it is on, and putting the originals
+    | back when it is turned off, so it costs nothing at all while off.  Read the counters with instrumentation_info().
+    | Generator methods and functions are timed over the items they produce, not just the call that creates them.
+    | Because the classes and module functions are patched in place, turning instrumentation on or off is not
+    | thread-safe: do it while no other thread is using musictools, or other threads may see half-patched classes.
+    | Set 'reset' to False to keep adding to the counters of an earlier run.
+    | A nested call, made while instrumentation is already on, never resets: the outer run keeps its counts.
+    """
+    global __instrumentation_depth
+    if reset and __instrumentation_depth == 0:
+        reset_instrumentation()
+    if __instrumentation_depth == 0:
+        _install_instrumentation()
+    __instrumentation_depth += 1
+
+def disable_instrumentation():
+    """Stop instrumentation started with enable_instrumentation.  The counters are kept until the next reset."""
+    global __instrumentation_depth
+    if __instrumentation_depth == 0:
+        return
+    __instrumentation_depth -= 1
+    if __instrumentation_depth == 0:
+        _remove_instrumentation()
+
+def reset_instrumentation():
+    """Set every instrumentation counter back to zero."""
+    for key in __calls:
+        __calls[key] = [0,0]
+    for key in __constructions:
+        __constructions[key] = 0
+
+@contextmanager
+def instrumented(reset=True):
+    """
+    | Turns instrumentation on inside a with block, for example:
+    |     with musictools.instrumented():
+    |         Chord(Note("C",4),"maj","7")
+    |     print(musictools.instrumentation_info())
+    | Nested blocks add to the counters of the outermost one.
+    | Generators are timed over their iteration (see enable_instrumentation).  Entering and leaving the block
+    | patches the classes and functions of the module in place, so it is not thread-safe: other threads using
+    | musictools at the same time may see half-patched classes, and their calls are counted while it is on.
+    """
+    enable_instrumentation(reset)
+    try:
+        yield
+    finally:
+        disable_instrumentation()
+
+def _cache_infos():
+    """Hit/miss counters of every cache musictools keeps, by name."""
+    caches = {}
+    pools = interning_info()
+    if pools is not None:
+        caches["note_pool"] = pools["Note"]
+        caches["interval_pool"] = pools["Interval"]
+    caches["mode_spellings"] = mode_cache_info()
+    caches["mode_index"] = MODE_INDEX.cache_info()
+    chords = chord_cache_info()
+    caches["chord_templates"] = chords["templates"]
+    caches["chord_tones"] = chords["chords"]
+    caches["chord_symbols"] = chords["symbols"]
+    return caches
+
+def instrumentation_info():
+    """
+    | Returns the instrumentation counters as a dictionary:
+    | 'enabled': whether instrumentation is on,
+    | 'constructions': {class name: objects created},
+    | 'calls': {"Class.method" or function name: {"calls": count, "seconds": total time, callees included}}, for those called,
+    | 'caches': {cache name: hits, misses, sizes and hit rate}, which are counted whether or not instrumentation is on.
+    """
+    caches = {}
+    for (name,info) in _cache_infos().items():
+        lookups = info["hits"] + info["misses"]
+        caches[name] = dict(info,hit_rate=info["hits"] / lookups if lookups else None)
+    return {
+        "enabled": __instrumentation_depth > 0,
+        "constructions": {name: count for (name,count) in __constructions.items() if count},
+        "calls": {
+            key: {"calls": calls, "seconds": nanoseconds / 1e9}
+            for (key,(calls,nanoseconds)) in __calls.items() if calls
+        },
+        "caches": caches,
+    }
+
+def _prometheus_label(value):
+    return value.replace("\\","\\\\").replace('"','\\"').replace("\n","\\n")
+
+def instrumentation_prometheus():
+    """Returns the instrumentation counters (see instrumentation_info) in the Prometheus text exposition format."""
+    info = instrumentation_info()
+    lines = []
+    def metric(name,kind,help,label,samples):
+        lines.append(f"# HELP musictools_{name} {help}")
+        lines.append(f"# TYPE musictools_{name} {kind}")
+        for (key,value) in samples:
+            lines.append(f'musictools_{name}{{{label}="{_prometheus_label(key)}"}} {value!r}')
+    metric("constructions_total","counter","Objects created, per class.","class",info["constructions"].items())
+    metric("calls_total","counter","Calls per method, property or function.","method",
+        [(key,call["calls"]) for (key,call) in info["calls"].items()])
+    metric("call_seconds_total","counter","Time spent per method, property or function, callees included.","method",
+        [(key,call["seconds"]) for (key,call) in info["calls"].items()])
+    caches = info["caches"]
+    metric("cache_hits_total","counter","Cache hits.","cache",[(name,cache["hits"]) for (name,cache) in caches.items()])
+    metric("cache_misses_total","counter","Cache misses.","cache",[(name,cache["misses"]) for (name,cache) in caches.items()])
+    metric("cache_entries","gauge","Entries in each cache.","cache",[(name,cache["currsize"]) for (name,cache) in caches.items()])
+    return "\n".join(lines) + "\n"
+
+def write_instrumentation(path):
+    """
+    | Writes the instrumentation counters to a Prometheus text file at 'path' (for example for node_exporter's
+    | textfile collector).  The file is written under a temporary name and then renamed, so readers never see half of it.
+    """
+    temporary = path + ".tmp"
+    with open(temporary,"w") as file:
+        file.write(instrumentation_prometheus())
+    replace(temporary,path)
+
+if __name__ == "__main__":
+    Amajor = Mode("A","major")
+    for note in Amajor:
+        print(note.note_name)
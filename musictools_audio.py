@@ -0,0 +1,478 @@
+"""
+Audio rendering for musictools.
+
+Turns sequences of Notes, Chords and Modes into NumPy float32 PCM, using each note's frequency (with the
+A4 and tuning in effect, see musictools.tuning) and its rhythm length at a tempo, and writes it to WAV files.
+
+    synth = Synth("saw", Envelope(0.01, 0.1, 0.7, 0.2), tempo=96)
+    samples = synth.render(melody, bass_line)
+    write_wav("out.wav", samples, synth.sample_rate)
+
+Long pieces, including the Staff and Piece objects of musictools_old, can be streamed to disk block by block:
+
+    synth.render_to_file("backing.wav", staff, progress=lambda done, total: print(done / total))
+"""
+
+import heapq
+import struct
+import wave
+from fractions import Fraction
+
+import numpy as np
+
+from musictools import Note, Chord, Mode
+
+WAVEFORMS = ("sine", "saw", "square")
+
+#Oscillators are computed this many samples at a time, so a batch of notes never holds more than that
+_BATCH_SAMPLES = 1 << 20
+
+def oscillate(waveform,phase):
+    """
+    | Returns float32 samples of a waveform at 'phase', an array of positions measured in cycles.
+    | 'waveform' is one of WAVEFORMS, or a wavetable: a 1-D array holding one cycle, read with linear interpolation.
+    """
+    phase = np.asarray(phase,dtype=np.float64) % 1.0
+    if type(waveform) is str:
+        if waveform == "sine":
+            return np.sin((2 * np.pi) * phase.astype(np.float32))
+        if waveform == "saw":
+            return (2 * phase - 1).astype(np.float32)
+        if waveform == "square":
+            return np.where(phase < 0.5,np.float32(1),np.float32(-1))
+        raise ValueError("Unknown waveform.  Use one of WAVEFORMS or a wavetable array.")
+    table = np.asarray(waveform,dtype=np.float32)
+    if table.ndim != 1 or len(table) < 2:
+        raise ValueError("A wavetable must be a 1-D array of at least 2 samples holding one cycle.")
+    position = phase * len(table)
+    index = position.astype(np.intp)
+    fraction = (position - index).astype(np.float32)
+    following = index + 1
+    following[following == len(table)] = 0
+    return table[index] + (table[following] - table[index]) * fraction
+
+class Envelope:
+
+    """
+    | An ADSR amplitude envelope.
+    | 'attack', 'decay' and 'release' are in seconds, 'sustain' is the level (0 to 1) held after the decay.
+    | The release starts when the note ends, from whatever level the envelope had reached,
+    | so a rendered note rings for its length plus the release.
+    """
+
+    __slots__ = ("__attack", "__decay", "__sustain", "__release")
+
+    def __init__(self,attack=0.005,decay=0.05,sustain=0.8,release=0.05):
+        for value in (attack,decay,release):
+            if type(value) not in (int,float) or value < 0:
+                raise ValueError("Attack, decay and release must be positive numbers of seconds or 0.")
+        if type(sustain) not in (int,float) or not 0 <= sustain <= 1:
+            raise ValueError("Sustain must be a level between 0 and 1.")
+        self.__attack = attack
+        self.__decay = decay
+        self.__sustain = sustain
+        self.__release = release
+
+    @property
+    def attack(self):
+        """Seconds from silence to full level."""
+        return self.__attack
+
+    @property
+    def decay(self):
+        """Seconds from full level down to the sustain level."""
+        return self.__decay
+
+    @property
+    def sustain(self):
+        """The level held until the note ends."""
+        return self.__sustain
+
+    @property
+    def release(self):
+        """Seconds from the end of the note down to silence."""
+        return self.__release
+
+    def release_samples(self,sample_rate):
+        """The number of samples the release adds after a note."""
+        return int(round(self.__release * sample_rate))
+
+    def shape(self,length,sample_rate):
+        """Returns the envelope of a note of 'length' samples as float32 levels, release included."""
+        return self.levels(length,sample_rate)
+
+    def levels(self,length,sample_rate,first=0,last=None):
+        """
+        | Returns samples 'first' up to (not including) 'last' of the envelope of a note of 'length' samples,
+        | as float32 levels.  'last' defaults to the end of the release.
+        """
+        release = self.release_samples(sample_rate)
+        if last is None:
+            last = length + release
+        attack = self.__attack * sample_rate
+        decay = self.__decay * sample_rate
+        points = ((0,attack,attack + decay),(0 if attack else 1,1,self.__sustain))
+        times = np.arange(first,last,dtype=np.float64)
+        held = min(max(length - first,0),len(times))
+        levels = np.empty(len(times),dtype=np.float64)
+        levels[:held] = np.interp(times[:held],*points)
+        if held < len(times):
+            end = np.interp(length,*points)
+            levels[held:] = end * (1 - (times[held:] - length + 1) / release)
+        return levels.astype(np.float32)
+
+    def __repr__(self):
+        return f"Envelope({self.__attack!r}, {self.__decay!r}, {self.__sustain!r}, {self.__release!r})"
+
+def _length(note):
+    if note.rhythm is None:
+        raise ValueError("Notes must have a rhythm to be rendered.")
+    return note.rhythm.length
+
+def _pitched(notes):
+    pitched = []
+    for note in notes:
+        if note.is_rest:
+            continue
+        if note.octave is None:
+            raise ValueError("Notes must have an octave to be rendered.")
+        pitched.append(note)
+    return pitched
+
+def _mode_notes(mode):
+    octave = 4 if mode.root.octave is None else mode.root.octave
+    notes = []
+    for note in mode.spelling:
+        note = Note(note.note_name,octave)
+        if notes and note.hard_pitch <= notes[-1].hard_pitch:
+            octave += 1
+            note = Note(note.note_name,octave)
+        notes.append(note)
+    return notes
+
+def _legacy_note(note):
+    """The length and notes of a Note of musictools_old, whose rhythm value is a float length in 512th notes."""
+    if not note.rhythm:
+        raise ValueError("Notes must have a rhythm to be rendered.")
+    #Dotted and triplet lengths are floats there; thirds of 512th notes are as fine as they get
+    length = Fraction(note.rhythm.value).limit_denominator(3)
+    if note.name == "Rest":
+        return length, []
+    if note.octave is None:
+        raise ValueError("Notes must have an octave to be rendered.")
+    return length, [Note(note.name,note.octave)]
+
+def schedule(sequence,start=0):
+    """
+    | Yields (onset, length, notes) for each item of 'sequence', with the onset and length in 512th notes
+    | (exact Fractions) from 'start', and the octave-valued Notes sounding (empty for a rest).
+    |
+    | Each item starts when the one before it ends:
+    | a Note sounds for its rhythm length (a rest is a silence), a Chord sounds all its notes for its root's
+    | rhythm length, and a Mode plays its spelling upwards from the root, each degree for the root's rhythm length.
+    | Notes need an octave and a rhythm; a Mode whose root has no octave starts in octave 4.
+    | Notes of musictools_old are taken too, respelled as musictools Notes.
+    """
+    onset = Fraction(start)
+    for item in sequence:
+        if type(item) is Note:
+            length = _length(item)
+            yield onset, length, _pitched((item,))
+            onset += length
+        elif type(item) is Chord:
+            length = _length(item.root)
+            yield onset, length, _pitched(item.notes)
+            onset += length
+        elif type(item) is Mode:
+            length = _length(item.root)
+            for note in _mode_notes(item):
+                yield onset, length, [note]
+                onset += length
+        elif hasattr(item,"rhythm") and hasattr(item,"name"):
+            (length,notes) = _legacy_note(item)
+            yield onset, length, notes
+            onset += length
+        else:
+            raise ValueError("Only Note, Chord and Mode objects can be rendered.")
+
+def staff_schedule(staff):
+    """
+    | Yields (onset, length, notes) like schedule for a Staff of musictools_old.
+    | Each Measure starts where the one before it ends by its length, however full that was,
+    | and its notes follow one another from the start of the Measure.
+    """
+    onset = Fraction(0)
+    for measure in staff.measures:
+        yield from schedule(measure.notes,onset)
+        onset += Fraction(measure.length).limit_denominator(3)
+
+def is_staff(voice):
+    """True for a Staff of musictools_old (anything with measures and a time signature)."""
+    return hasattr(voice,"measures") and hasattr(voice,"timesig")
+
+def staves(voices):
+    """Returns 'voices' with each Piece of musictools_old replaced by its staves."""
+    return [staff for voice in voices for staff in (voice._staves if hasattr(voice,"_staves") else (voice,))]
+
+class Synth:
+
+    """
+    | Renders sequences of Notes, Chords and Modes to float32 PCM.
+    |
+    | 'waveform' is one of WAVEFORMS or a wavetable (see oscillate), 'envelope' an Envelope.
+    | 'tempo' is in beats per minute, and 'beat' is the length of a beat in 512th notes (128, a quarter note).
+    | 'amplitude' is the peak level of each note; voices are added up without limiting, so keep it low for many voices.
+    |
+    | Each voice is a sequence of Notes, Chords and Modes played one after another (see schedule).
+    """
+
+    __slots__ = ("__waveform", "__envelope", "__sample_rate", "__tempo", "__beat", "__amplitude")
+
+    def __init__(self,waveform="sine",envelope=None,sample_rate=48000,tempo=120,beat=128,amplitude=0.2):
+        if type(waveform) is str:
+            if waveform not in WAVEFORMS:
+                raise ValueError("Unknown waveform.  Use one of WAVEFORMS or a wavetable array.")
+        else:
+            waveform = np.array(waveform,dtype=np.float32)
+            if waveform.ndim != 1 or len(waveform) < 2:
+                raise ValueError("A wavetable must be a 1-D array of at least 2 samples holding one cycle.")
+        if envelope is None:
+            envelope = Envelope()
+        elif type(envelope) is not Envelope:
+            raise ValueError("The envelope must be an Envelope object.")
+        if type(sample_rate) is not int or sample_rate < 1:
+            raise ValueError("The sample rate must be a positive integer.")
+        if type(tempo) not in (int,float) or tempo <= 0:
+            raise ValueError("The tempo must be a positive number of beats per minute.")
+        if type(beat) not in (int,Fraction) or beat <= 0:
+            raise ValueError("The beat must be a positive length in 512th notes.")
+        if type(amplitude) not in (int,float):
+            raise ValueError("The amplitude must be a number.")
+        self.__waveform = waveform
+        self.__envelope = envelope
+        self.__sample_rate = sample_rate
+        self.__tempo = tempo
+        self.__beat = beat
+        self.__amplitude = amplitude
+
+    @property
+    def waveform(self):
+        """The waveform name or wavetable."""
+        return self.__waveform
+
+    @property
+    def envelope(self):
+        """The Envelope of every note."""
+        return self.__envelope
+
+    @property
+    def sample_rate(self):
+        """Samples per second."""
+        return self.__sample_rate
+
+    @property
+    def tempo(self):
+        """Beats per minute."""
+        return self.__tempo
+
+    @property
+    def samples_per_512th(self):
+        """The number of samples (a float) in a 512th note at this tempo."""
+        return self.__sample_rate * 60 / (self.__tempo * self.__beat)
+
+    def _timeline(self,voice):
+        """Returns the samples per 512th note and the schedule of a voice: a sequence or a Staff."""
+        if not is_staff(voice):
+            return self.samples_per_512th, schedule(voice)
+        tempo = voice.timesig.tempo
+        if tempo is None:
+            return self.samples_per_512th, staff_schedule(voice)
+        #A Staff with a tempo keeps it, counting beats in the unit of its time signature
+        return self.__sample_rate * 60 / (tempo.bpm * voice.timesig.gets_beat.rhythm.value), staff_schedule(voice)
+
+    def _voice_notes(self,voice):
+        """Yields (start sample, length in samples, frequency) for each note of a voice, in order of start."""
+        (scale,timeline) = self._timeline(voice)
+        for (onset,length,notes) in timeline:
+            #Rounding both ends from exact onsets keeps long pieces from drifting
+            start = int(round(onset * scale))
+            samples = int(round((onset + length) * scale)) - start
+            for note in notes:
+                yield start, samples, note.frequency
+
+    def _end(self,voices):
+        """The sample at which the last note of 'voices' ends (before its release), without finding any frequencies."""
+        end = 0
+        for voice in voices:
+            (scale,timeline) = self._timeline(voice)
+            for (onset,length,notes) in timeline:
+                if notes:
+                    end = max(end,int(round((onset + length) * scale)))
+        return end
+
+    def _events(self,voices):
+        """Returns the start sample, length in samples and frequency of every note of 'voices', as arrays."""
+        starts = []
+        lengths = []
+        frequencies = []
+        #A Piece of musictools_old stands for all of its staves
+        for voice in staves(voices):
+            for (start,samples,frequency) in self._voice_notes(voice):
+                starts.append(start)
+                lengths.append(samples)
+                frequencies.append(frequency)
+        return (
+            np.array(starts,dtype=np.int64),
+            np.array(lengths,dtype=np.int64),
+            np.array(frequencies,dtype=np.float64),
+        )
+
+    def _render_events(self,output,starts,lengths,frequencies,offset=0):
+        """
+        | Adds the notes to 'output', whose first sample is sample 'offset' of the piece.
+        | Notes of the same length share one envelope and are computed together as a 2-D array.
+        """
+        for length in np.unique(lengths).tolist():
+            chosen = np.flatnonzero(lengths == length)
+            envelope = self.__envelope.shape(length,self.__sample_rate) * np.float32(self.__amplitude)
+            width = len(envelope)
+            if not width:
+                continue
+            times = np.arange(width,dtype=np.float64)
+            rows = max(1,_BATCH_SAMPLES // width)
+            for first in range(0,len(chosen),rows):
+                batch = chosen[first:first + rows]
+                block = oscillate(self.__waveform,np.outer(frequencies[batch] / self.__sample_rate,times))
+                block *= envelope
+                for (start,samples) in zip((starts[batch] - offset).tolist(),block):
+                    low = max(start,0)
+                    high = min(start + width,len(output))
+                    if low < high:
+                        output[low:high] += samples[low - start:high - start]
+
+    def render(self,*voices):
+        """
+        | Renders each of 'voices' (a sequence of Notes, Chords and Modes, see Synth) from the start
+        | and returns them mixed as a 1-D float32 array, long enough for the last release.
+        | A voice can also be a Staff of musictools_old, and a Piece stands for all of its staves.
+        | For pieces too long to hold in memory, use render_to_file.
+        """
+        (starts,lengths,frequencies) = self._events(voices)
+        if not len(starts):
+            return np.zeros(0,dtype=np.float32)
+        release = self.__envelope.release_samples(self.__sample_rate)
+        output = np.zeros(int((starts + lengths).max()) + release,dtype=np.float32)
+        self._render_events(output,starts,lengths,frequencies)
+        return output
+
+    def _render_block(self,output,offset,notes):
+        """Adds the part of each of 'notes' (start, length, frequency) that falls in 'output', which starts at sample 'offset'."""
+        release = self.__envelope.release_samples(self.__sample_rate)
+        amplitude = np.float32(self.__amplitude)
+        for (start,length,frequency) in notes:
+            first = max(offset - start,0)
+            last = min(length + release,offset + len(output) - start)
+            if first >= last:
+                continue
+            samples = oscillate(self.__waveform,np.arange(first,last,dtype=np.float64) * (frequency / self.__sample_rate))
+            samples *= self.__envelope.levels(length,self.__sample_rate,first,last)
+            samples *= amplitude
+            output[start + first - offset:start + last - offset] += samples
+
+    def render_to_file(self,path,*voices,format="wav",block=65536,progress=None):
+        """
+        | Renders 'voices' (see render) into a file, 'block' samples at a time, and returns the number of samples.
+        |
+        | The file is sized up front and memory-mapped.  Notes are taken from the voices as they are reached,
+        | merged in order of start, and each block is mixed from only the notes sounding in it,
+        | so memory stays bounded by the block size and the number of voices sounding at once, however long the piece.
+        | Sizing the file takes a first pass over the voices, so they must be sequences (or Staffs), not iterators.
+        | 'format' is "wav" (16-bit PCM, clipped to -1 to 1) or "raw" (little-endian float32 samples, no header).
+        | A WAV file is written with empty sizes in its header, which are filled in when the render is done,
+        | so an interrupted render does not look like a complete file.
+        | 'progress' is called as progress(samples done, total samples) after each block.
+        """
+        if format not in ("wav","raw"):
+            raise ValueError('The format must be "wav" or "raw".')
+        if type(block) is not int or block < 1:
+            raise ValueError("The block size must be a positive integer.")
+        voices = staves(voices)
+        for voice in voices:
+            if not is_staff(voice) and iter(voice) is voice:
+                raise ValueError("Voices are read twice when rendering to a file, so they cannot be iterators.")
+        release = self.__envelope.release_samples(self.__sample_rate)
+        last = self._end(voices)
+        total = last + release if last else 0
+
+        header = _wav_header(0,self.__sample_rate) if format == "wav" else b""
+        width = 2 if format == "wav" else 4
+        with open(path,"wb") as file:
+            file.write(header)
+            file.truncate(len(header) + width * total)
+        if total:
+            output = np.memmap(path,dtype="<i2" if format == "wav" else "<f4",mode="r+",offset=len(header),shape=(total,))
+            notes = heapq.merge(*(self._voice_notes(voice) for voice in voices))
+            following = next(notes,None)
+            sounding = []
+            mixed = np.zeros(block,dtype=np.float32)
+            for offset in range(0,total,block):
+                end = min(offset + block,total)
+                while following is not None and following[0] < end:
+                    sounding.append(following)
+                    following = next(notes,None)
+                sounding = [note for note in sounding if note[0] + note[1] + release > offset]
+                mixed[:] = 0
+                self._render_block(mixed[:end - offset],offset,sounding)
+                if format == "wav":
+                    output[offset:end] = (np.clip(mixed[:end - offset],-1,1) * 32767).round()
+                else:
+                    output[offset:end] = mixed[:end - offset]
+                if progress is not None:
+                    progress(end,total)
+            output.flush()
+            del output
+        if format == "wav":
+            with open(path,"r+b") as file:
+                file.write(_wav_header(total,self.__sample_rate))
+        return total
+
+    def __repr__(self):
+        waveform = self.__waveform if type(self.__waveform) is str else "wavetable"
+        return f"Synth({waveform!r}, {self.__envelope!r}, sample_rate={self.__sample_rate}, tempo={self.__tempo})"
+
+def render(*voices,waveform="sine",envelope=None,sample_rate=48000,tempo=120,amplitude=0.2):
+    """Renders 'voices' with a Synth made from the other arguments.  See Synth.render."""
+    return Synth(waveform,envelope,sample_rate,tempo,amplitude=amplitude).render(*voices)
+
+def _wav_header(frames,sample_rate):
+    """The 44-byte header of a mono 16-bit PCM WAV file of 'frames' samples."""
+    size = 2 * frames
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF",36 + size,b"WAVE",
+        b"fmt ",16,1,1,sample_rate,2 * sample_rate,2,16,
+        b"data",size,
+    )
+
+def to_pcm16(samples):
+    """Converts float samples (-1 to 1, clipped beyond) to 16-bit PCM bytes in little-endian order."""
+    samples = np.clip(np.asarray(samples,dtype=np.float32),-1,1)
+    return (samples * 32767).round().astype("<i2").tobytes()
+
+def write_wav(path,samples,sample_rate=48000):
+    """
+    | Writes float samples to a 16-bit PCM WAV file with the stdlib wave module.
+    | 'samples' is 1-D for mono or of shape (n, channels), and is clipped to -1 to 1.
+    """
+    samples = np.asarray(samples,dtype=np.float32)
+    if samples.ndim == 1:
+        channels = 1
+    elif samples.ndim == 2:
+        channels = samples.shape[1]
+    else:
+        raise ValueError("Samples must be a 1-D array or have the shape (n, channels).")
+    with wave.open(str(path),"wb") as output:
+        output.setnchannels(channels)
+        output.setsampwidth(2)
+        output.setframerate(sample_rate)
+        output.writeframes(to_pcm16(samples))
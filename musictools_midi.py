@@ -0,0 +1,643 @@
+"""
+Standard MIDI File export and import for musictools.
+
+Writes sequences of Notes, Chords and Modes, NoteArrays, and the Staff and Piece objects of musictools_old
+to format 0 or format 1 MIDI files.  A note's key is its hard_pitch + 12 (so C4 is key 60), and its ticks
+come from its rhythm length in 512th notes: a quarter note (128) is 'ppq' ticks.
+
+    write_midi("song.mid", melody, bass_line, ppq=480, tempo=96)
+
+Files are read back one track at a time as MidiTrack batches of arrays:
+
+    for track in read_midi("song.mid"):
+        track.notes, track.onset, track.duration, track.velocity
+"""
+
+import mmap
+import os
+import struct
+from fractions import Fraction
+from math import log2
+
+import numpy as np
+
+from musictools import Note, Chord, Mode, NoteArray
+from musictools_audio import schedule, is_staff, staves, _mode_notes
+
+#The MIDI key of hard_pitch 0 (C0)
+MIDI_KEY_OFFSET = 12
+
+#NoteArrays with more dots than this are timed note by note, so that exact lengths stay within 64-bit integers
+_MAX_ARRAY_DOTS = 16
+
+_NOTE_ON = 0x90
+_END_OF_TRACK = b"\x00\xff\x2f\x00"
+
+def _ticks(onset,ppq):
+    """Rounds an exact onset in 512th notes to the nearest tick (halves round up)."""
+    #Integer arithmetic on the numerator and denominator is many times faster than Fraction arithmetic
+    (numerator,denominator) = (onset.numerator,onset.denominator)
+    return (numerator * ppq * 2 + 128 * denominator) // (256 * denominator)
+
+def _schedule_notes(timeline,ppq):
+    """Returns the on ticks, off ticks and keys of the notes of a schedule, as arrays."""
+    on = []
+    off = []
+    keys = []
+    for (onset,length,notes) in timeline:
+        if not notes:
+            continue
+        start = _ticks(onset,ppq)
+        end = _ticks(onset + length,ppq)
+        for note in notes:
+            on.append(start)
+            off.append(end)
+            keys.append(note.hard_pitch + MIDI_KEY_OFFSET)
+    return np.array(on,dtype=np.int64), np.array(off,dtype=np.int64), np.array(keys,dtype=np.int64)
+
+def _units(rhythm):
+    """
+    | Returns a rhythm's length as a whole number of units of a 512th note / (3 * 2^dots), and its dots.
+    | These are the units _array_notes counts in, so a sequence is timed without any Fraction arithmetic.
+    """
+    if rhythm is None:
+        raise ValueError("Notes must have a rhythm to be written.")
+    dots = rhythm.dots
+    return (1024 >> rhythm.value) * ((2 << dots) - 1) * (2 if rhythm.triplet else 3), dots
+
+def _legacy_units(length):
+    """A length of musictools_old (a float in 512th notes) in units of a 512th note / 6, rounded as schedule rounds it."""
+    length = Fraction(length).limit_denominator(3)
+    return length.numerator * 6 // length.denominator
+
+class _Timeline:
+
+    """
+    | Collects the slots of a sequence (or of each Measure of a Staff) in the order schedule yields them,
+    | with integer lengths (see _units), and the key and slot of every note that sounds.
+    | Each distinct Note (by its values) is looked at once; after that it is a single dictionary lookup.
+    """
+
+    __slots__ = ("units", "dots", "slots", "keys", "measures", "__notes", "__keys", "__legacy")
+
+    def __init__(self):
+        self.units = []
+        self.dots = []
+        self.slots = []
+        self.keys = []
+        #(first slot, onset in units of a 512th note / 6) of each Measure of a Staff
+        self.measures = []
+        #(units, dots, key) by Note._fields(), with a key of None for rests
+        self.__notes = {}
+        #Keys of the notes of Chords and Modes, by Note._fields()
+        self.__keys = {}
+        self.__legacy = {}
+
+    def __note(self,note):
+        fields = note._fields()
+        entry = self.__notes.get(fields)
+        if entry is None:
+            (units,dots) = _units(note.rhythm)
+            if note.is_rest:
+                key = None
+            elif note.octave is None:
+                raise ValueError("Notes must have an octave to be written.")
+            else:
+                key = note.hard_pitch + MIDI_KEY_OFFSET
+            entry = self.__notes[fields] = (units,dots,key)
+        return entry
+
+    def __key(self,note):
+        """The key of a note played for the length of another (a Chord or Mode root), with the same checks as a Note."""
+        fields = note._fields()
+        key = self.__keys.get(fields,-1)
+        if key == -1:
+            if note.is_rest:
+                key = None
+            elif note.octave is None:
+                raise ValueError("Notes must have an octave to be written.")
+            else:
+                key = note.hard_pitch + MIDI_KEY_OFFSET
+            self.__keys[fields] = key
+        return key
+
+    def __legacy_units(self,length):
+        units = self.__legacy.get(length)
+        if units is None:
+            units = self.__legacy[length] = _legacy_units(length)
+        return units
+
+    def add(self,sequence):
+        """Adds the slots of a sequence of Notes, Chords and Modes (see schedule)."""
+        units = self.units
+        dots = self.dots
+        slots = self.slots
+        keys = self.keys
+        known = self.__notes
+        known_keys = self.__keys
+        note_of = self.__note
+        key_of = self.__key
+        for item in sequence:
+            if type(item) is Note:
+                entry = known.get(item._fields()) or note_of(item)
+                if entry[2] is not None:
+                    slots.append(len(units))
+                    keys.append(entry[2])
+                units.append(entry[0])
+                dots.append(entry[1])
+            elif type(item) is Chord:
+                (length,dot) = _units(item.root.rhythm)
+                slot = len(units)
+                for note in item.notes:
+                    key = known_keys.get(note._fields(),-1)
+                    if key == -1:
+                        key = key_of(note)
+                    if key is not None:
+                        slots.append(slot)
+                        keys.append(key)
+                units.append(length)
+                dots.append(dot)
+            elif type(item) is Mode:
+                (length,dot) = _units(item.root.rhythm)
+                for note in _mode_notes(item):
+                    slots.append(len(units))
+                    keys.append(key_of(note))
+                    units.append(length)
+                    dots.append(dot)
+            elif hasattr(item,"rhythm") and hasattr(item,"name"):
+                if not item.rhythm:
+                    raise ValueError("Notes must have a rhythm to be written.")
+                if item.name != "Rest":
+                    if item.octave is None:
+                        raise ValueError("Notes must have an octave to be written.")
+                    slots.append(len(units))
+                    keys.append(key_of(Note(item.name,item.octave)))
+                units.append(self.__legacy_units(item.rhythm.value))
+                dots.append(1)
+            else:
+                raise ValueError("Only Note, Chord and Mode objects can be written.")
+
+    def add_staff(self,staff):
+        """Adds the Measures of a Staff of musictools_old, each starting where the one before it ends (see staff_schedule)."""
+        onset = 0
+        for measure in staff.measures:
+            self.measures.append((len(self.units),onset))
+            self.add(measure.notes)
+            onset += self.__legacy_units(measure.length)
+
+    def ticks(self,ppq):
+        """Returns the on ticks, off ticks and keys of the notes, as arrays."""
+        if not self.keys:
+            return (np.zeros(0,dtype=np.int64),) * 3
+        most = max(self.dots)
+        if self.measures:
+            #Measure onsets are counted in sixths of a 512th note, which need at least one dot's worth of units
+            most = max(most,1)
+        if most <= _MAX_ARRAY_DOTS:
+            dtype = np.int64
+            units = np.array(self.units,dtype=dtype) << (most - np.array(self.dots,dtype=np.int64))
+        else:
+            #Past _MAX_ARRAY_DOTS dots lengths may not fit in 64-bit integers, so they are added up as Python integers
+            dtype = object
+            units = np.array([length << (most - dot) for (length,dot) in zip(self.units,self.dots)],dtype=dtype)
+        end = np.cumsum(units)
+        start = end - units
+        if self.measures:
+            (firsts,onsets) = zip(*self.measures)
+            firsts = np.array(firsts,dtype=np.int64)
+            before = np.concatenate((np.zeros(1,dtype=dtype),end))[firsts]
+            shift = np.array([onset << (most - 1) for onset in onsets],dtype=dtype) - before
+            measure = np.repeat(np.arange(len(firsts)),np.diff(firsts,append=len(units)))
+            start = start + shift[measure]
+            end = end + shift[measure]
+        per_512th = 3 << most
+        slots = np.array(self.slots,dtype=np.int64)
+        (on,off) = (((times[slots] * (2 * ppq) + 128 * per_512th) // (256 * per_512th)).astype(np.int64) for times in (start,end))
+        return on, off, np.array(self.keys,dtype=np.int64)
+
+def _array_notes(array,ppq):
+    """The NoteArray version of _Timeline.ticks, timed with whole-array integer arithmetic."""
+    if not len(array):
+        return (np.zeros(0,dtype=np.int64),) * 3
+    rhythm = array.rhythm.astype(np.int64)
+    if not rhythm.all():
+        raise ValueError("Notes must have a rhythm to be written.")
+    if not np.all(array.has_octave | array.is_rest):
+        raise ValueError("Notes must have an octave to be written.")
+    dots = array.dots.astype(np.int64)
+    most = int(dots.max())
+    if most > _MAX_ARRAY_DOTS:
+        return _schedule_notes(schedule(array.to_notes()),ppq)
+    #Lengths are counted in units of a 512th note / (3 * 2^most), which makes every dotted and triplet length whole
+    units = ((1024 >> rhythm) * ((2 << dots) - 1)) << (most - dots)
+    units *= np.where(array.triplet.astype(bool),2,3)
+    per_512th = 3 << most
+    end = np.cumsum(units)
+    start = end - units
+    pitched = ~array.is_rest
+    keys = array.hard_pitch.data[pitched] + MIDI_KEY_OFFSET
+    (start,end) = ((times[pitched] * (2 * ppq) + 128 * per_512th) // (256 * per_512th) for times in (start,end))
+    return start, end, keys.astype(np.int64)
+
+def _track_notes(track,ppq):
+    if type(track) is NoteArray:
+        return _array_notes(track,ppq)
+    timeline = _Timeline()
+    if is_staff(track):
+        timeline.add_staff(track)
+    else:
+        timeline.add(track)
+    return timeline.ticks(ppq)
+
+def _events(on,off,keys,channel,velocity):
+    """
+    | Returns the ticks, status bytes and two data bytes of the note-on and note-off events of some notes, in order.
+    | Note-offs are sent as note-ons with velocity 0, so a whole track can share one running status.
+    | At the same tick, note-offs come first, so a repeated key is not cut short by its own earlier note.
+    """
+    if len(keys) and (keys.min() < 0 or keys.max() > 127):
+        raise ValueError("Notes must be between C-1 and G9 (MIDI keys 0 to 127) to be written.")
+    #A note always lasts at least one tick, so its note-off never comes before its note-on
+    off = np.maximum(off,on + 1)
+    count = len(keys)
+    ticks = np.concatenate((off,on))
+    is_on = np.repeat(np.array((0,1),dtype=np.int8),count)
+    order = np.lexsort((is_on,ticks))
+    return (
+        ticks[order],
+        np.full(2 * count,_NOTE_ON | channel,dtype=np.uint8),
+        np.concatenate((keys,keys)).astype(np.uint8)[order],
+        np.where(is_on[order] == 1,velocity,0).astype(np.uint8),
+    )
+
+def _merge(events):
+    """Merges lists of events (see _events) into one, in order of tick."""
+    (ticks,statuses,data1,data2) = (np.concatenate(column) for column in zip(*events))
+    order = np.argsort(ticks,kind="stable")
+    return ticks[order], statuses[order], data1[order], data2[order]
+
+def _layout(ticks,statuses):
+    """
+    | Returns the delta times, the number of bytes of each delta, whether each status byte is sent,
+    | and the size of each encoded event.  A status byte is left out (running status) when it repeats.
+    """
+    deltas = np.diff(ticks,prepend=0)
+    if len(deltas) and deltas.max() >= 1 << 28:
+        raise ValueError("The time between two events is too long for a MIDI file.")
+    lengths = 1 + (deltas >= 1 << 7).astype(np.int64) + (deltas >= 1 << 14) + (deltas >= 1 << 21)
+    sent = np.ones(len(statuses),dtype=bool)
+    sent[1:] = statuses[1:] != statuses[:-1]
+    return deltas, lengths, sent, lengths + sent + 2
+
+def _encode(buffer,position,deltas,lengths,sent,sizes,statuses,data1,data2):
+    """Writes events into 'buffer' (a uint8 array) from 'position', all at once per byte column."""
+    starts = position + np.cumsum(sizes) - sizes
+    for byte in range(4):
+        chosen = lengths > byte
+        if not chosen.any():
+            break
+        remaining = lengths[chosen] - 1 - byte
+        #Every byte of a variable-length quantity but the last has its top bit set
+        buffer[starts[chosen] + byte] = ((deltas[chosen] >> (7 * remaining)) & 0x7F) | ((remaining > 0) << 7)
+    data = starts + lengths
+    buffer[data[sent]] = statuses[sent]
+    data += sent
+    buffer[data] = data1
+    buffer[data + 1] = data2
+
+def _meta(kind,data):
+    return b"\x00\xff" + bytes((kind,len(data))) + data
+
+def _tempo_metas(tracks,tempo):
+    """The tempo and time signature meta events, from the first Staff with them, else from 'tempo' in quarter notes."""
+    metas = b""
+    beat = 128
+    for track in tracks:
+        if is_staff(track):
+            signature = track.timesig
+            metas += _meta(0x58,bytes((signature.beats_per_measure,int(log2(512 / signature.gets_beat.rhythm.value)),24,8)))
+            if signature.tempo is not None:
+                (tempo,beat) = (signature.tempo.bpm,signature.gets_beat.rhythm.value)
+            break
+    microseconds = int(round(60000000 * beat / (128 * tempo)))
+    if not 0 < microseconds < 1 << 24:
+        raise ValueError("The tempo is out of the range a MIDI file can hold.")
+    return _meta(0x51,microseconds.to_bytes(3,"big")) + metas
+
+def encode_midi(*tracks,ppq=480,tempo=120,format=None,velocity=96):
+    """
+    | Returns a Standard MIDI File, as a bytearray, of 'tracks'.
+    |
+    | Each track is a sequence of Notes, Chords and Modes (timed as in musictools_audio.schedule), a NoteArray,
+    | or a Staff of musictools_old; a Piece stands for all of its staves.  Track n plays on channel n % 16.
+    | Chord notes become simultaneous events, and rests become time between events.
+    | 'ppq' is the number of ticks in a quarter note, and 'tempo' is in quarter notes per minute,
+    | unless a Staff has a time signature with a tempo (the first Staff's time signature is written too).
+    | 'format' is 0 (every track merged into one) or 1 (one MIDI track per track); by default it is 0 for one track.
+    | Events are laid out and encoded for a whole file at once into one preallocated bytearray.
+    """
+    tracks = staves(tracks)
+    if not tracks:
+        raise ValueError("Please provide at least one track.")
+    if format is None:
+        format = 0 if len(tracks) == 1 else 1
+    if format not in (0,1):
+        raise ValueError("The MIDI file format must be 0 or 1.")
+    if type(ppq) is not int or not 0 < ppq < 1 << 15:
+        raise ValueError("Ticks per quarter note must be an integer from 1 to 32767.")
+    if type(tempo) not in (int,float) or tempo <= 0:
+        raise ValueError("The tempo must be a positive number of beats per minute.")
+    if type(velocity) is not int or not 0 < velocity < 128:
+        raise ValueError("Velocity must be an integer from 1 to 127.")
+
+    events = [_events(*_track_notes(track,ppq),index % 16,velocity) for (index,track) in enumerate(tracks)]
+    if format == 0:
+        events = [_merge(events)]
+    metas = _tempo_metas(tracks,tempo)
+    layouts = [_layout(ticks,statuses) for (ticks,statuses,data1,data2) in events]
+    sizes = [len(metas) * (index == 0) + int(layout[3].sum()) + len(_END_OF_TRACK) for (index,layout) in enumerate(layouts)]
+
+    midi = bytearray(14 + 8 * len(layouts) + sum(sizes))
+    buffer = np.frombuffer(midi,dtype=np.uint8)
+    midi[:14] = b"MThd" + struct.pack(">IHHH",6,format,len(layouts),ppq)
+    position = 14
+    for (index,(layout,size,(ticks,statuses,data1,data2))) in enumerate(zip(layouts,sizes,events)):
+        midi[position:position + 8] = b"MTrk" + struct.pack(">I",size)
+        position += 8
+        if index == 0:
+            midi[position:position + len(metas)] = metas
+            position += len(metas)
+        _encode(buffer,position,*layout,statuses,data1,data2)
+        position += int(layout[3].sum())
+        midi[position:position + len(_END_OF_TRACK)] = _END_OF_TRACK
+        position += len(_END_OF_TRACK)
+    del buffer
+    return midi
+
+def write_midi(path,*tracks,ppq=480,tempo=120,format=None,velocity=96):
+    """Writes a Standard MIDI File of 'tracks' (see encode_midi) and returns its size in bytes."""
+    midi = encode_midi(*tracks,ppq=ppq,tempo=tempo,format=format,velocity=velocity)
+    with open(path,"wb") as file:
+        file.write(midi)
+    return len(midi)
+
+#Major keys by their number of sharps (positive) or flats (negative) in a key signature, from 7 flats up
+_MAJOR_KEYS = ("Cb", "Gb", "Db", "Ab", "Eb", "Bb", "F", "C", "G", "D", "A", "E", "B", "F#", "C#")
+
+class MidiTrack:
+
+    """
+    | The notes of one track of a MIDI file, as yielded by read_midi: parallel arrays with one entry per note,
+    | in order of note-on.
+    |
+    | 'keys' are MIDI key numbers, 'onset' and 'duration' are in ticks ('ppq' to a quarter note),
+    | and 'notes' is a NoteArray of the same pitches, spelled in 'key_signature' (a Mode) where there is one.
+    """
+
+    __slots__ = ("__index", "__ppq", "__keys", "__onset", "__duration", "__velocity", "__channel", "__key_signature", "__prefer_flat")
+
+    def __init__(self,index,ppq,keys,onset,duration,velocity,channel,key_signature=None,prefer_flat=False):
+        self.__index = index
+        self.__ppq = ppq
+        self.__keys = keys
+        self.__onset = onset
+        self.__duration = duration
+        self.__velocity = velocity
+        self.__channel = channel
+        self.__key_signature = key_signature
+        self.__prefer_flat = prefer_flat
+
+    @property
+    def index(self):
+        """The number of the track in the file, from 0."""
+        return self.__index
+
+    @property
+    def ppq(self):
+        """Ticks per quarter note."""
+        return self.__ppq
+
+    @property
+    def keys(self):
+        """The MIDI key number of each note."""
+        return self.__keys
+
+    @property
+    def hard_pitch(self):
+        """The Note.hard_pitch of each note: its MIDI key - 12."""
+        return self.__keys.astype(np.int64) - MIDI_KEY_OFFSET
+
+    @property
+    def onset(self):
+        """The tick of each note-on."""
+        return self.__onset
+
+    @property
+    def duration(self):
+        """The ticks from each note-on to its note-off (or to the end of the track, for a note never turned off)."""
+        return self.__duration
+
+    @property
+    def length(self):
+        """The duration of each note in 512th notes (a float array), the unit of Rhythm.length."""
+        return self.__duration * (128 / self.__ppq)
+
+    @property
+    def velocity(self):
+        """The note-on velocity of each note."""
+        return self.__velocity
+
+    @property
+    def channel(self):
+        """The channel (0 to 15) of each note."""
+        return self.__channel
+
+    @property
+    def key_signature(self):
+        """The Mode the notes are spelled in, or None."""
+        return self.__key_signature
+
+    @property
+    def notes(self):
+        """A NoteArray of the pitches (without rhythms), spelled by key_signature or by the Note.from_hard_pitch rules."""
+        return NoteArray.from_hard_pitches(self.hard_pitch,self.__prefer_flat,self.__key_signature)
+
+    def __len__(self):
+        return len(self.__keys)
+
+    def __repr__(self):
+        return f"MidiTrack({self.__index}, {len(self.__keys)} notes, ppq={self.__ppq})"
+
+def _variable_length(data,position):
+    """Reads a variable-length quantity, and returns it with the position after it."""
+    value = 0
+    for _ in range(4):
+        byte = data[position]
+        position += 1
+        value = (value << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return value, position
+    raise ValueError(f"A variable-length quantity at byte {position - 4} is longer than 4 bytes.")
+
+def _parse_track(data,position,end):
+    """
+    | Decodes the events of a track chunk from 'position' to 'end', pairing each note-on with the first
+    | note-off of the same channel and key that follows it.  Only plain lists of numbers are built.
+    | Returns the onsets, durations, keys, velocities and channels of the notes, and the first key signature (or None).
+    """
+    onsets = []
+    durations = []
+    keys = []
+    velocities = []
+    channels = []
+    sounding = {}
+    signature = None
+    tick = 0
+    status = 0
+    while position < end:
+        #The delta time, a variable-length quantity of up to 4 bytes
+        byte = data[position]
+        position += 1
+        delta = byte & 0x7F
+        count = 1
+        while byte & 0x80:
+            if count == 4:
+                raise ValueError(f"A delta time at byte {position - 4} is longer than 4 bytes.")
+            byte = data[position]
+            position += 1
+            delta = (delta << 7) | (byte & 0x7F)
+            count += 1
+        tick += delta
+
+        byte = data[position]
+        if byte & 0x80:
+            position += 1
+            if byte >= 0xF0:
+                #Meta and system exclusive events cancel running status
+                status = 0
+                if byte == 0xFF:
+                    kind = data[position]
+                    (length,position) = _variable_length(data,position + 1)
+                    if kind == 0x2F:
+                        position += length
+                        break
+                    if kind == 0x59 and signature is None and length >= 2:
+                        signature = data[position] - 256 if data[position] > 127 else data[position]
+                elif byte == 0xF0 or byte == 0xF7:
+                    (length,position) = _variable_length(data,position)
+                else:
+                    raise ValueError(f"Unexpected status byte {byte:#04x} at byte {position - 1}.")
+                position += length
+                continue
+            status = byte
+        elif not status:
+            raise ValueError(f"The data byte at {position} has no status byte before it.")
+
+        kind = status & 0xF0
+        if kind == 0x90 or kind == 0x80:
+            key = data[position]
+            velocity = data[position + 1]
+            if (key | velocity) & 0x80:
+                raise ValueError(f"A note message at byte {position} has a data byte over 127.")
+            position += 2
+            note = (status & 0x0F) << 7 | key
+            if kind == 0x90 and velocity:
+                sounding.setdefault(note,[]).append(len(onsets))
+                onsets.append(tick)
+                durations.append(-1)
+                keys.append(key)
+                velocities.append(velocity)
+                channels.append(status & 0x0F)
+            else:
+                waiting = sounding.get(note)
+                if waiting:
+                    index = waiting.pop(0)
+                    durations[index] = tick - onsets[index]
+        elif kind == 0xC0 or kind == 0xD0:
+            position += 1
+        else:
+            position += 2
+    if position > end:
+        raise ValueError(f"A track runs past the end of its chunk at byte {end}.")
+
+    #Notes never turned off last until the end of the track
+    for waiting in sounding.values():
+        for index in waiting:
+            durations[index] = tick - onsets[index]
+    return onsets, durations, keys, velocities, channels, signature
+
+def _read_tracks(data,key,prefer_flat):
+    """Yields a MidiTrack for each track chunk of the MIDI file in 'data' (bytes, or a memory map of a file)."""
+    if key is not None and type(key) is not Mode:
+        raise ValueError("The key must be a Mode object.")
+    if type(prefer_flat) is not bool:
+        raise ValueError("prefer_flat must be Boolean.")
+    if len(data) < 14 or data[:4] != b"MThd":
+        raise ValueError("Not a MIDI file: it does not start with an MThd header.")
+    (length,format,count,division) = struct.unpack(">IHHH",data[4:14])
+    if length < 6:
+        raise ValueError("The MIDI file header is too short.")
+    if format > 2:
+        raise ValueError(f"Unknown MIDI file format {format}.")
+    if division & 0x8000:
+        raise ValueError("MIDI files timed in SMPTE frames are not supported, only ticks per quarter note.")
+    if not division:
+        raise ValueError("The MIDI file has 0 ticks per quarter note.")
+
+    position = 8 + length
+    index = 0
+    signature = None
+    while position + 8 <= len(data):
+        chunk = data[position:position + 4]
+        (length,) = struct.unpack(">I",data[position + 4:position + 8])
+        position += 8
+        if position + length > len(data):
+            raise ValueError(f"The file ends inside a {chunk!r} chunk that should run to byte {position + length}.")
+        #Chunks of other types are skipped, as the standard asks
+        if chunk == b"MTrk":
+            try:
+                (onsets,durations,keys,velocities,channels,found) = _parse_track(data,position,position + length)
+            except IndexError:
+                raise ValueError(f"Track {index} ends in the middle of an event.") from None
+            #In format 1, a key signature in the first track holds for the tracks after it
+            if found is not None and -7 <= found <= 7:
+                signature = found
+            elif format != 1:
+                signature = None
+            spelling = key
+            if spelling is None and signature is not None:
+                spelling = Mode(_MAJOR_KEYS[signature + 7],"major")
+            yield MidiTrack(
+                index,division,
+                np.array(keys,dtype=np.uint8),
+                np.array(onsets,dtype=np.int64),
+                np.array(durations,dtype=np.int64),
+                np.array(velocities,dtype=np.uint8),
+                np.array(channels,dtype=np.uint8),
+                spelling,prefer_flat,
+            )
+            index += 1
+        position += length
+    if position != len(data) and index < count:
+        raise ValueError("The MIDI file ends in the middle of a chunk header.")
+
+def parse_midi(data,key=None,prefer_flat=False):
+    """The version of read_midi for a MIDI file already in memory, as bytes or a bytearray."""
+    return _read_tracks(data,key,prefer_flat)
+
+def read_midi(path,key=None,prefer_flat=False):
+    """
+    | Yields a MidiTrack of the notes of each track of a MIDI file (format 0, 1 or 2), one track at a time.
+    |
+    | The file is read through a memory map, and each track is decoded straight into arrays, without an object per event,
+    | so memory is bounded by the largest track.  Notes are paired with the first note-off (or note-on of velocity 0)
+    | of the same channel and key, and notes never turned off end with their track.
+    | 'key' is a Mode to spell the notes in.  By default they follow the key signature in the file (for format 1,
+    | in the first track, or in their own), and where there is none, the Note.from_hard_pitch rules with 'prefer_flat'.
+    | A malformed file raises a ValueError saying where it went wrong.
+    """
+    with open(path,"rb") as file:
+        if not os.fstat(file.fileno()).st_size:
+            raise ValueError("Not a MIDI file: it is empty.")
+        with mmap.mmap(file.fileno(),0,access=mmap.ACCESS_READ) as data:
+            yield from _read_tracks(data,key,prefer_flat)
@@ -21,7 +21,7 @@ _LETTERS = {"C":(0,0),"D":(1,2),"E":(2,4),"F":(3,5),"G":(4,7),"A":(5,9),"B":(6,1
 
 _LETTER_IND = ("A","B","C","D","E","F","G")
 
-_RHYTHMS = ("double whole","whole","quarter","8th","16th","32nd","64th","128th","256th","512th")
+_RHYTHMS = ("double whole","whole","half","quarter","8th","16th","32nd","64th","128th","256th","512th")
 
 _NATURALS = {"B":"Cb","C":"B#","E":"Fb","F":"E#"}
 
@@ -1039,7 +1039,7 @@ class TimeSignature:
     def __init__(self,top,bottom,tempo_bpm=None):
         self.name = str(top) + "/" + str(bottom)
         self.beats_per_measure = top
-        self.gets_beat = Note("R",rhythm=log2(bottom*2))
+        self.gets_beat = Note("R",rhythm=int(log2(bottom*2)))
         self.measure_len = self.gets_beat.rhythm.value * top
         if tempo_bpm:
             self.tempo = Tempo(tempo_bpm)
@@ -1248,7 +1248,7 @@ class Measure:
     def fullness(self):
         fullness = 0
         for note in self.notes:
-            fullness += note.value
+            fullness += note.rhythm.value
         return fullness
 
     @property